@@ -1,30 +1,157 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from database import AsyncSessionLocal
+from models import TokenRevocation
 from schemas import TokenResponse
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = "MedinoteDoc"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+# NOTIFY channel that carries revocations to every API process
+REVOCATIONS_CHANNEL = os.getenv("REVOCATIONS_CHANNEL", "medinote_revocations")
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# pbkdf2 is CPU-bound; run it on a dedicated bounded pool instead of the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def create_refresh_token(data: dict):
+def create_refresh_token(data: dict, family: str = None):
+    """
+    Refresh tokens carry a unique `jti` and the `fam` id shared by every token rotated
+    from the same login; pass `family` to continue an existing family.
+    """
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode = data.copy()
-    to_encode.update({"exp": expire, "type": "refresh"})
+    jti = uuid.uuid4().hex
+    to_encode.update({"exp": expire, "type": "refresh", "jti": jti, "fam": family or jti})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_token_pair(email: str, doctor_id, family: str = None):
+    """
+    Returns (access_token, refresh_token, family). The access token carries the family
+    too, so revoking the family (logout) also rejects its access tokens.
+    """
+    family = family or uuid.uuid4().hex
+    refresh_token = create_refresh_token({"sub": email, "doctor_id": str(doctor_id)}, family)
+    access_token = create_access_token({"sub": email, "doctor_id": str(doctor_id), "fam": family})
+    return access_token, refresh_token, family
+
+def token_id(token: str, payload: dict) -> str:
+    # Tokens issued before rotation existed have no jti; identify them by their digest
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+class TokenDenylist:
+    """
+    Revoked refresh-token ids and token families, each kept only until every token it
+    could match has expired, so the set stays as small as the revocations in flight.
+    """
+    def __init__(self, purge_interval: float = 60):
+        self.purge_interval = purge_interval
+        self._entries = {}
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, key: str, expires_at: float):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = max(expires_at, self._entries.get(key, 0))
+            if now >= self._next_purge:
+                self._entries = {k: exp for k, exp in self._entries.items() if exp > now}
+                self._next_purge = now + self.purge_interval
+
+    def __contains__(self, key) -> bool:
+        if key is None:
+            return False
+        expires_at = self._entries.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Checked in memory. Each revocation is stored in token_revocation and broadcast over
+# REVOCATIONS_CHANNEL in one statement; main.py subscribes every API worker, and a worker
+# reloads the stored, unexpired revocations whenever its listener (re)connects.
+token_denylist = TokenDenylist()
+
+async def revoke(key: str, expires_at: float):
+    """
+    Denylists a token id or family here, stores it and broadcasts it to every other API process.
+    """
+    token_denylist.add(key, expires_at)
+    payload = json.dumps({"key": key, "exp": expires_at})
+    statement = insert(TokenRevocation).values(key=key, expires_at=datetime.fromtimestamp(expires_at, timezone.utc))
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TokenRevocation.key],
+                set_={"expires_at": func.greatest(TokenRevocation.expires_at, statement.excluded.expires_at)},
+            ).returning(func.pg_notify(REVOCATIONS_CHANNEL, payload))
+        )
+        await session.commit()
+
+async def load_revocations():
+    """
+    Copies the stored, unexpired revocations into this process's denylist, dropping
+    expired rows on the way. Runs whenever the revocation listener (re)connects.
+    """
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= func.now()))
+        rows = (await session.execute(select(TokenRevocation.key, TokenRevocation.expires_at))).all()
+        await session.commit()
+    for key, expires_at in rows:
+        token_denylist.add(key, expires_at.timestamp())
+
+async def revoke_family(family: str):
+    # No token in the family can outlive a refresh token issued right now
+    await revoke(family, time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+
+def apply_revocation(payload: str):
+    """
+    REVOCATIONS_CHANNEL handler: adds a revocation broadcast by any process (this one included).
+    """
+    try:
+        message = json.loads(payload)
+        token_denylist.add(message["key"], float(message["exp"]))
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring malformed revocation: %r", payload)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
+
+async def get_password_hash_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    """
+    Verifies a password off the event loop. Returns (valid, new_hash), where new_hash is
+    set when the stored hash uses outdated parameters and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,81 @@
+"""
+Benchmark: requests per second for the create endpoints against a local Postgres.
+
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_create_endpoints.py
+
+Measures /auth/signup, /v1/add-patient-ext and /session/upload-session with
+BENCH_CONCURRENCY concurrent clients. Run it on two checkouts to compare before and
+after a change. Rows created for the run are removed by deleting the scratch doctors.
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import text
+from database import engine
+from main import app
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "32"))
+RUN_ID = uuid.uuid4().hex[:8]
+
+
+async def measure(label, make_request):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            response = await make_request(i)
+            if response.status_code >= 400:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:28s} {REQUESTS / elapsed:9.1f} req/s  ({failures} failures)")
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await measure("POST /auth/signup", lambda i: client.post("/auth/signup", json={
+            "name": "Bench", "email": f"bench-{RUN_ID}-{i}@example.com", "password": "bench-password",
+        }))
+
+        signup = await client.post("/auth/signup", json={
+            "name": "Bench", "email": f"bench-{RUN_ID}-owner@example.com", "password": "bench-password",
+        })
+        signup.raise_for_status()
+        doctor_id = signup.json()["doctor_id"]
+        client.headers["Authorization"] = f"Bearer {signup.json()['access_token']}"
+
+        await measure("POST /v1/add-patient-ext", lambda i: client.post("/v1/add-patient-ext", json={
+            "doctor_id": doctor_id, "name": f"Patient {i}", "email": f"patient-{i}@example.com",
+        }))
+
+        patient = await client.get("/v1/patient-id-by-email", params={"email": "patient-0@example.com"})
+        patient.raise_for_status()
+        patient_id = patient.json()["id"]
+        async with engine.begin() as conn:
+            template_id = (await conn.execute(text(
+                "INSERT INTO template (id, doctor_id, title, type) VALUES (gen_random_uuid(), :d, 'Bench', 'custom') RETURNING id"
+            ), {"d": doctor_id})).scalar()
+
+        await measure("POST /session/upload-session", lambda i: client.post("/session/upload-session", json={
+            "patientId": patient_id, "userId": doctor_id, "status": "recording",
+            "startTime": "2024-01-01T09:00:00", "templateId": str(template_id),
+        }))
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM doctor WHERE email LIKE :pattern"), {"pattern": f"bench-{RUN_ID}-%"})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark: latency of an unrelated database-backed endpoint while a storm of logins is running.
+
+Needs a reachable DATABASE_URL with an existing doctor account:
+
+    BENCH_EMAIL=doc@example.com BENCH_PASSWORD=secret python benchmarks/bench_login_storm.py
+
+Reports p50/p99 of GET /v1/patient-id-by-email (one primary-pool query, like chunk
+notifications) with no load and during BENCH_LOGINS concurrent logins. Logins that hold
+a pooled connection while hashing show up here as pool waits.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from main import app
+
+EMAIL = os.getenv("BENCH_EMAIL", "bench@example.com")
+PASSWORD = os.getenv("BENCH_PASSWORD", "bench-password")
+LOGINS = int(os.getenv("BENCH_LOGINS", "200"))
+LOGIN_CONCURRENCY = int(os.getenv("BENCH_LOGIN_CONCURRENCY", "50"))
+PROBES = int(os.getenv("BENCH_PROBES", "200"))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def probe(client, headers, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        # An address with no patient: a 404 after one indexed lookup
+        response = await client.get("/v1/patient-id-by-email", params={"email": "nobody@example.invalid"},
+                                    headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 404, response.text
+        await asyncio.sleep(0.005)
+    return samples
+
+
+async def storm(client):
+    semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+    async def login():
+        async with semaphore:
+            await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+
+    await asyncio.gather(*(login() for _ in range(LOGINS)))
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        idle = await probe(client, headers, PROBES)
+        storm_task = asyncio.create_task(storm(client))
+        loaded = await probe(client, headers, PROBES)
+        start = time.perf_counter()
+        await storm_task
+        elapsed = time.perf_counter() - start
+
+    for label, samples in (("idle", idle), ("login storm", loaded)):
+        print(f"patient lookup {label:12s} p50={percentile(samples, 50) * 1000:7.2f}ms p99={percentile(samples, 99) * 1000:7.2f}ms")
+    print(f"{LOGINS} logins finished {elapsed:.2f}s after the probes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
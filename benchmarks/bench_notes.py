@@ -0,0 +1,93 @@
+"""
+Throughput of note generation: inline on the event loop versus KeywordNoteGenerator's
+process pool, one session per call and batched across sessions. Also reports how long
+the event loop is blocked, which is what request handlers would feel.
+
+    python benchmarks/bench_notes.py [--sessions 2000] [--sentences 200] [--workers 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notes import KeywordNoteGenerator, NoteTemplate, SOAP_SECTIONS, generate_note
+
+FILLER = ("okay", "so", "and", "the", "patient", "mentioned", "that", "it", "was", "about", "maybe", "well")
+
+
+def make_transcript(rng: random.Random, sentences: int) -> str:
+    vocabulary = [w for words in SOAP_SECTIONS.values() for w in words]
+    out = []
+    for _ in range(sentences):
+        words = rng.choices(FILLER, k=rng.randint(6, 14)) + rng.choices(vocabulary, k=rng.randint(0, 3))
+        rng.shuffle(words)
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+
+async def max_loop_stall(coro):
+    """
+    Runs `coro` while a ticker measures the longest gap between event-loop ticks.
+    """
+    worst = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    try:
+        return await coro, worst
+    finally:
+        done.set()
+        await task
+
+
+async def main(args):
+    rng = random.Random(42)
+    template = NoteTemplate("SOAP note", "default")
+    items = [(make_transcript(rng, args.sentences), template) for _ in range(args.sessions)]
+    megabytes = sum(len(t) for t, _ in items) / 1e6
+
+    async def inline():
+        return [generate_note(t, tpl) for t, tpl in items]
+
+    generator = KeywordNoteGenerator(workers=args.workers, batch_size=args.batch_size)
+    # Start the pool processes outside the timed runs
+    await generator.generate_many(items[:args.workers])
+
+    async def per_session():
+        return await asyncio.gather(*(generator.generate(t, tpl) for t, tpl in items))
+
+    async def batched():
+        return await generator.generate_many(items)
+
+    try:
+        for name, run in (("inline", inline), ("pool, concurrent generate()", per_session), ("pool, generate_many()", batched)):
+            start = time.perf_counter()
+            notes, stall = await max_loop_stall(run())
+            elapsed = time.perf_counter() - start
+            assert len(notes) == len(items)
+            print(f"{name:30s} {len(items) / elapsed:9.1f} sessions/s  {megabytes / elapsed:7.2f} MB/s  "
+                  f"max loop stall {stall * 1000:8.2f} ms")
+    finally:
+        await generator.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000, help="transcripts to process")
+    parser.add_argument("--sentences", type=int, default=200, help="sentences per transcript")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pool processes")
+    parser.add_argument("--batch-size", type=int, default=16, help="transcripts per pool submission")
+    asyncio.run(main(parser.parse_args()))
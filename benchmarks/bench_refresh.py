@@ -0,0 +1,53 @@
+"""
+Micro-benchmark: cost of renewing a session with /auth/login (pbkdf2 verification)
+versus /auth/refresh (JWT decode, denylist check, signing, and one statement that stores
+and broadcasts the rotated-out token). Reports CPU time, plus wall time for refresh,
+which includes that database round trip.
+
+Needs a reachable DATABASE_URL with migration_add_token_revocation.sql applied. The
+revocations it writes expire with the bench token and are purged by load_revocations.
+
+    python benchmarks/bench_refresh.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import create_token_pair, get_password_hash, token_denylist, verify_password
+from routers.doctor import refresh_tokens
+from schemas import RefreshRequest
+
+
+def bench_login(iterations: int) -> float:
+    stored = get_password_hash("bench-password")
+    start = time.process_time()
+    for _ in range(iterations):
+        verify_password("bench-password", stored)
+    return (time.process_time() - start) / iterations
+
+
+async def bench_refresh(iterations: int):
+    """
+    Returns (CPU seconds, wall seconds) per refresh.
+    """
+    _, refresh_token, _ = create_token_pair("bench@example.com", "00000000-0000-0000-0000-000000000001")
+    # Open the connection pool outside the timed loop
+    refresh_token = (await refresh_tokens(RefreshRequest(refresh_token=refresh_token)))["refresh_token"]
+    start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(iterations):
+        # Each refresh rotates the token, as a real client would
+        refresh_token = (await refresh_tokens(RefreshRequest(refresh_token=refresh_token)))["refresh_token"]
+    return (time.process_time() - start) / iterations, (time.perf_counter() - wall_start) / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    login = bench_login(iterations)
+    refresh, refresh_wall = asyncio.run(bench_refresh(iterations * 10))
+    print(f"login (pbkdf2 verify): {login * 1000:8.3f} ms CPU/request")
+    print(f"refresh:               {refresh * 1000:8.3f} ms CPU/request, {refresh_wall * 1000:8.3f} ms wall/request")
+    print(f"CPU ratio:             {login / refresh:8.1f}x")
+    print(f"denylist entries:      {len(token_denylist)}")
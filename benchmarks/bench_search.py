@@ -0,0 +1,87 @@
+"""
+Benchmark: /v1/search latency as one doctor's session history grows.
+
+Needs a reachable DATABASE_URL with migration_add_search_vectors.sql applied. Seeds a
+scratch doctor and patient, grows their sessions through BENCH_SEARCH_SIZES using
+server-side generate_series inserts, and times searches at each size. The scratch
+doctor (and, by cascade, its data) is deleted afterwards.
+
+    BENCH_SEARCH_SIZES=1000,10000,100000,1000000 python benchmarks/bench_search.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import text
+from auth import create_access_token
+from database import engine
+from main import app
+
+SIZES = [int(n) for n in os.getenv("BENCH_SEARCH_SIZES", "1000,10000,100000,1000000").split(",")]
+QUERIES = ["chest pain", "hypertension follow up", "migraine", "\"shortness of breath\""]
+REPEATS = int(os.getenv("BENCH_SEARCH_REPEATS", "20"))
+
+WORDS = "cough fever headache migraine hypertension diabetes asthma fatigue nausea dizziness chest pain shortness breath rash"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def seed(doctor_id, patient_id, start, stop):
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            INSERT INTO session (id, doctor_id, patient_id, session_title, session_summary, transcript, status, start_time)
+            SELECT gen_random_uuid(), :doctor_id, :patient_id,
+                   'Consult ' || g,
+                   (string_to_array(:words, ' '))[1 + g % 15] || ' review',
+                   repeat((string_to_array(:words, ' '))[1 + (g * 7) % 15] || ' ' ||
+                          (string_to_array(:words, ' '))[1 + (g * 11) % 15] || ' discussed. ', 20),
+                   'completed', to_char(now() - g * interval '1 minute', 'YYYY-MM-DD"T"HH24:MI:SS')
+            FROM generate_series(:start, :stop - 1) AS g
+        """), {"doctor_id": doctor_id, "patient_id": patient_id, "words": WORDS, "start": start, "stop": stop})
+
+
+async def main():
+    doctor_id, patient_id = uuid.uuid4(), uuid.uuid4()
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "INSERT INTO doctor (id, name, email, password_hash) VALUES (:id, 'Bench', :email, 'x')"
+        ), {"id": doctor_id, "email": f"bench-{doctor_id}@example.com"})
+        await conn.execute(text(
+            "INSERT INTO patient (id, doctor_id, name, email) VALUES (:id, :doctor_id, 'Bench Patient', 'p@example.com')"
+        ), {"id": patient_id, "doctor_id": doctor_id})
+
+    token = create_access_token({"sub": "bench", "doctor_id": str(doctor_id)})
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            seeded = 0
+            for size in SIZES:
+                await seed(doctor_id, patient_id, seeded, size)
+                seeded = size
+                async with engine.begin() as conn:
+                    await conn.execute(text("ANALYZE session"))
+                samples = []
+                for _ in range(REPEATS):
+                    for q in QUERIES:
+                        start = time.perf_counter()
+                        response = await client.get("/v1/search", params={"q": q, "limit": 20})
+                        samples.append(time.perf_counter() - start)
+                        response.raise_for_status()
+                print(f"{size:>9} sessions: p50={percentile(samples, 50) * 1000:7.2f}ms "
+                      f"p95={percentile(samples, 95) * 1000:7.2f}ms")
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM doctor WHERE id = :id"), {"id": doctor_id})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
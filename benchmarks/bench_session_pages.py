@@ -0,0 +1,121 @@
+"""
+Benchmark: /session/all-session page latency at the start and deep into a large history.
+
+Needs a reachable DATABASE_URL with migration_session_keyset_index.sql applied. Seeds a
+scratch doctor with BENCH_PAGE_SESSIONS sessions (a few without start_time), checks with
+EXPLAIN that both pagination phases are served by ix_session_doctor_start_id without a
+Sort node, then walks every page and reports latency. The scratch doctor is deleted
+afterwards.
+
+    BENCH_PAGE_SESSIONS=200000 python benchmarks/bench_session_pages.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import text
+from auth import create_access_token
+from database import engine
+from main import app
+
+SESSIONS = int(os.getenv("BENCH_PAGE_SESSIONS", "200000"))
+PAGE_SIZE = int(os.getenv("BENCH_PAGE_SIZE", "50"))
+
+# Same shape as the two queries get_all_sessions issues for a cursor
+EXPLAIN_QUERIES = {
+    "start_time phase": """
+        SELECT id, patient_id, start_time FROM session
+        WHERE doctor_id = :doctor_id AND start_time IS NOT NULL AND (start_time, id) < (:start_time, :id)
+        ORDER BY start_time DESC NULLS LAST, id DESC LIMIT 51
+    """,
+    "NULL tail phase": """
+        SELECT id, patient_id, start_time FROM session
+        WHERE doctor_id = :doctor_id AND start_time IS NULL AND id < :id
+        ORDER BY id DESC LIMIT 51
+    """,
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def seed(doctor_id, patient_id):
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "INSERT INTO doctor (id, name, email, password_hash) VALUES (:id, 'Bench', :email, 'x')"
+        ), {"id": doctor_id, "email": f"bench-{doctor_id}@example.com"})
+        await conn.execute(text(
+            "INSERT INTO patient (id, doctor_id, name, email) VALUES (:id, :doctor_id, 'Bench Patient', 'p@example.com')"
+        ), {"id": patient_id, "doctor_id": doctor_id})
+        # ISO strings, the format upload-session stores; every 1000th session has no start_time
+        await conn.execute(text("""
+            INSERT INTO session (id, doctor_id, patient_id, session_title, status, start_time)
+            SELECT gen_random_uuid(), :doctor_id, :patient_id, 'Consult ' || g, 'completed',
+                   CASE WHEN g % 1000 = 0 THEN NULL
+                        ELSE to_char(now() - g * interval '1 minute', 'YYYY-MM-DD"T"HH24:MI:SS') END
+            FROM generate_series(1, :n) AS g
+        """), {"doctor_id": doctor_id, "patient_id": patient_id, "n": SESSIONS})
+        await conn.execute(text("ANALYZE session"))
+
+
+async def explain(doctor_id) -> bool:
+    ok = True
+    params = {"doctor_id": doctor_id, "start_time": "2000-01-01T00:00:00", "id": uuid.UUID(int=2 ** 128 - 1)}
+    async with engine.connect() as conn:
+        for name, sql in EXPLAIN_QUERIES.items():
+            plan = "\n".join(r[0] for r in await conn.execute(text("EXPLAIN " + sql), params))
+            uses_index = "ix_session_doctor_start_id" in plan
+            sorts = "Sort" in plan
+            ok = ok and uses_index and not sorts
+            print(f"EXPLAIN {name}: index={'yes' if uses_index else 'NO'} sort={'YES' if sorts else 'no'}")
+            if not uses_index or sorts:
+                print(plan)
+    return ok
+
+
+async def main():
+    doctor_id, patient_id = uuid.uuid4(), uuid.uuid4()
+    await seed(doctor_id, patient_id)
+    token = create_access_token({"sub": "bench", "doctor_id": str(doctor_id)})
+    transport = httpx.ASGITransport(app=app)
+    try:
+        plan_ok = await explain(doctor_id)
+        samples = []
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            cursor, seen = None, 0
+            while True:
+                params = {"userId": str(doctor_id), "limit": PAGE_SIZE}
+                if cursor:
+                    params["cursor"] = cursor
+                start = time.perf_counter()
+                response = await client.get("/session/all-session", params=params)
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+                body = response.json()
+                seen += len(body["sessions"])
+                cursor = body.get("nextCursor")
+                if not cursor:
+                    break
+        print(f"{seen} sessions in {len(samples)} pages: first={samples[0] * 1000:.2f}ms "
+              f"p50={percentile(samples, 50) * 1000:.2f}ms p99={percentile(samples, 99) * 1000:.2f}ms "
+              f"last={samples[-1] * 1000:.2f}ms")
+        if seen != SESSIONS:
+            print(f"expected {SESSIONS} sessions, paged through {seen}")
+            plan_ok = False
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM doctor WHERE id = :id"), {"id": doctor_id})
+    if not plan_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Benchmark: time from interpreter start to the first served request.
+
+Runs a fresh interpreter that imports `main`, runs the startup hooks and serves
+GET /health in-process, with no DATABASE_URL or Supabase credentials set. Fails
+(exit 1) when the median of BENCH_STARTUP_RUNS exceeds STARTUP_BUDGET_MS.
+
+    STARTUP_BUDGET_MS=1500 python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+RUNS = int(os.getenv("BENCH_STARTUP_RUNS", "5"))
+
+PROBE = """
+import time
+start = time.perf_counter()
+import asyncio, httpx
+from main import app
+imported = time.perf_counter()
+
+async def first_request():
+    await app.router.startup()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://startup") as client:
+        response = await client.get("/health")
+        assert response.status_code == 200, response.status_code
+    await app.router.shutdown()
+
+asyncio.run(first_request())
+done = time.perf_counter()
+print(f"{(imported - start) * 1000:.1f} {(done - start) * 1000:.1f}")
+"""
+
+
+def main():
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("DATABASE_URL", "DATABASE_READ_URL", "SUPABASE_URL", "SUPABASE_SERVICE_KEY")}
+    env["JOB_WORKERS_ENABLED"] = "false"
+    imports, totals = [], []
+    for _ in range(RUNS):
+        output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout.split()
+        imports.append(float(output[0]))
+        totals.append(float(output[1]))
+    median = statistics.median(totals)
+    print(f"import main:            median {statistics.median(imports):8.1f}ms")
+    print(f"import to first request: median {median:8.1f}ms (budget {BUDGET_MS:.0f}ms)")
+    if median > BUDGET_MS:
+        print("over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Load test replaying the recording workflow against the FastAPI app in-process:
+
+    signup/login -> add patient -> upload-session
+      -> N x (get-presigned-url -> PUT chunk -> notify-chunk-uploaded) -> all-session
+
+Runs against DATABASE_URL (a local Postgres) with the local storage backend, so no
+external service is needed. Reports throughput, p50/p95/p99 latency and database
+queries per request for each endpoint, and saves them as a JSON baseline.
+
+    python benchmarks/loadtest.py --doctors 20 --chunks 30 --save benchmarks/baselines/current.json
+    python benchmarks/loadtest.py --compare benchmarks/baselines/current.json
+
+With --compare, the exit status is 1 when any endpoint's p95 latency regresses by
+more than --tolerance (default 20%).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before the app (and its storage backend) is imported
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="medinote-loadtest-"))
+os.environ.setdefault("JOB_WORKERS_ENABLED", "false")
+
+import httpx
+from sqlalchemy import text
+from database import engine
+from main import app
+from metrics import QUERY_LATENCY
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def query_counts() -> dict:
+    return {labels[0]: entry[2] for labels, entry in QUERY_LATENCY.values.items()}
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, name, request):
+        start = time.perf_counter()
+        response = await request
+        self.samples[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+
+async def recording_flow(client, recorder, run_id, index, chunks, chunk_bytes):
+    email = f"loadtest-{run_id}-{index}@example.com"
+    response = await recorder.call("POST /auth/signup", client.post("/auth/signup", json={
+        "name": "Load Test", "email": email, "password": "loadtest-password",
+    }))
+    response.raise_for_status()
+    response = await recorder.call("POST /auth/login", client.post("/auth/login", json={
+        "email": email, "password": "loadtest-password",
+    }))
+    response.raise_for_status()
+    doctor_id = response.json()["doctor_id"]
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await recorder.call("POST /v1/add-patient-ext", client.post("/v1/add-patient-ext", headers=headers, json={
+        "doctor_id": doctor_id, "name": "Patient", "email": f"patient-{index}@example.com",
+    }))
+    response.raise_for_status()
+    patient_id = response.json()["patient"]["id"]
+
+    async with engine.begin() as conn:
+        template_id = (await conn.execute(text(
+            "INSERT INTO template (id, doctor_id, title, type) VALUES (gen_random_uuid(), :d, 'Load test', 'custom') RETURNING id"
+        ), {"d": doctor_id})).scalar()
+
+    response = await recorder.call("POST /session/upload-session", client.post("/session/upload-session", headers=headers, json={
+        "patientId": patient_id, "userId": doctor_id, "status": "recording",
+        "startTime": "2024-01-01T09:00:00", "templateId": str(template_id),
+    }))
+    response.raise_for_status()
+    session_id = response.json()["id"]
+
+    payload = os.urandom(chunk_bytes)
+    for chunk_number in range(1, chunks + 1):
+        response = await recorder.call("POST /v1/get-presigned-url", client.post("/v1/get-presigned-url", headers=headers, json={
+            "sessionId": session_id, "chunkNumber": chunk_number, "mimeType": "audio/webm",
+        }))
+        response.raise_for_status()
+        signed = response.json()
+        await recorder.call("PUT /v1/upload/{path:path}", client.put(
+            signed["url"], headers={**headers, "Content-Type": "audio/webm"}, content=payload,
+        ))
+        await recorder.call("POST /v1/notify-chunk-uploaded", client.post("/v1/notify-chunk-uploaded", headers=headers, json={
+            "sessionId": session_id, "gcsPath": signed["supabasePath"], "chunkNumber": chunk_number,
+            "isLast": chunk_number == chunks, "totalChunksClient": chunks, "publicUrl": signed["publicUrl"],
+            "mimeType": "audio/webm", "selectedTemplateId": str(template_id), "model": "default",
+        }))
+
+    await recorder.call("GET /session/all-session", client.get(
+        "/session/all-session", headers=headers, params={"userId": doctor_id},
+    ))
+
+
+def build_report(recorder, elapsed, queries_before, queries_after, args) -> dict:
+    endpoints = {}
+    for name, samples in sorted(recorder.samples.items()):
+        # Endpoint names are "<method> <route template>", matching the metrics route label
+        route = name.split(" ", 1)[1]
+        queries = queries_after.get(route, 0) - queries_before.get(route, 0)
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": recorder.errors[name],
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "db_queries_per_request": round(queries / len(samples), 2),
+        }
+    return {
+        "config": {"doctors": args.doctors, "chunks": args.chunks, "chunk_bytes": args.chunk_bytes,
+                   "concurrency": args.concurrency, "python": platform.python_version()},
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": sum(len(s) for s in recorder.samples.values()),
+        "endpoints": endpoints,
+    }
+
+
+def compare(report, baseline, tolerance) -> bool:
+    ok = True
+    for name, current in report["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if not previous:
+            continue
+        change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0
+        flag = "REGRESSION" if change > tolerance else ""
+        ok = ok and not flag
+        print(f"{name:34s} p95 {previous['p95_ms']:9.2f}ms -> {current['p95_ms']:9.2f}ms ({change:+.0%}) "
+              f"queries {previous['db_queries_per_request']} -> {current['db_queries_per_request']} {flag}")
+    return ok
+
+
+async def main(args):
+    run_id = uuid.uuid4().hex[:8]
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    recorder = Recorder()
+
+    async def one(index):
+        async with semaphore:
+            await recording_flow(client, recorder, run_id, index, args.chunks, args.chunk_bytes)
+
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            queries_before = query_counts()
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.doctors)))
+            elapsed = time.perf_counter() - start
+            queries_after = query_counts()
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM doctor WHERE email LIKE :p"), {"p": f"loadtest-{run_id}-%"})
+        await app.router.shutdown()
+
+    report = build_report(recorder, elapsed, queries_before, queries_after, args)
+    for name, stats in report["endpoints"].items():
+        print(f"{name:34s} {stats['throughput_rps']:8.1f} req/s  p50={stats['p50_ms']:8.2f}ms "
+              f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms  "
+              f"queries/req={stats['db_queries_per_request']}  errors={stats['errors']}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=10, help="recording flows to run")
+    parser.add_argument("--chunks", type=int, default=20, help="audio chunks per recording")
+    parser.add_argument("--chunk-bytes", type=int, default=64 * 1024, help="size of each uploaded chunk")
+    parser.add_argument("--concurrency", type=int, default=10, help="flows running at once")
+    parser.add_argument("--save", help="write the report as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 regression (fraction)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from sqlalchemy import func, select
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# NOTIFY channel that carries response-cache invalidations to every API process
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "medinote_cache_invalidations")
+
+
+class LRUCache:
+    """
+    Size-bounded LRU cache whose entries expire after `ttl` seconds, or earlier
+    when a per-entry `expires_at` (epoch seconds) is given to `set`.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class MemoryResponseCache:
+    """
+    In-process cache of serialized responses, stored as (etag, body) pairs.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str):
+        return self._cache.get(key)
+
+    async def set(self, key: str, etag: str, body: bytes, ttl: Optional[float] = None):
+        self._cache.set(key, (etag, body), expires_at=time.time() + ttl if ttl else None)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.delete(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class RedisResponseCache:
+    """
+    Redis-backed variant of MemoryResponseCache, shared by all workers so that
+    invalidations are seen everywhere. Requires the `redis` package.
+    """
+    def __init__(self, url: str, ttl: float, prefix: str = "medinote:"):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        raw = await self._redis.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag, _, body = raw.partition(b"\n")
+        return etag.decode(), body
+
+    async def set(self, key: str, etag: str, body: bytes, ttl: Optional[float] = None):
+        await self._redis.set(self.prefix + key, etag.encode() + b"\n" + body, ex=int(ttl or self.ttl))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*[self.prefix + key for key in keys])
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """
+    Returns the shared response cache: Redis when REDIS_URL is set, in-process otherwise.
+    """
+    global _response_cache
+    if _response_cache is None:
+        ttl = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            _response_cache = RedisResponseCache(redis_url, ttl)
+        else:
+            _response_cache = MemoryResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "2048")), ttl)
+    return _response_cache
+
+
+async def invalidate(*keys: str):
+    """
+    Drops keys from the response cache in every API process. The in-process backend is
+    per worker, so the keys are also broadcast over CACHE_INVALIDATION_CHANNEL.
+    """
+    cache = get_response_cache()
+    await cache.delete(*keys)
+    if keys and isinstance(cache, MemoryResponseCache):
+        async with AsyncSessionLocal() as session:
+            await session.execute(select(func.pg_notify(CACHE_INVALIDATION_CHANNEL, json.dumps(keys))))
+            await session.commit()
+
+
+def apply_invalidation(payload: str):
+    """
+    CACHE_INVALIDATION_CHANNEL handler: drops keys invalidated by any process.
+    """
+    cache = get_response_cache()
+    if not isinstance(cache, MemoryResponseCache):
+        return
+    try:
+        keys = json.loads(payload)
+    except ValueError:
+        logger.warning("Ignoring malformed cache invalidation: %r", payload)
+        return
+    for key in keys:
+        cache._cache.delete(key)
+
+
+async def clear_local_cache():
+    # Invalidations sent while the listener was disconnected are lost; start over
+    cache = get_response_cache()
+    if isinstance(cache, MemoryResponseCache):
+        cache.clear()
@@ -0,0 +1,99 @@
+"""
+Incrementally maintained dashboard totals.
+
+Each session write adjusts one doctor_dashboard row and one doctor_patient_summary row
+inside the writer's transaction. /v1/dashboard reads those rows, so it never scans
+`session`. The counters are seeded for existing data by migration_add_dashboard.sql.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import case, func, literal_column, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+from models import DoctorDashboard, DoctorPatientSummary, Session
+from events import publish
+
+STATUS_COLUMNS = {
+    "recording": DoctorDashboard.recording_count,
+    "completed": DoctorDashboard.completed_count,
+    "failed": DoctorDashboard.failed_count,
+}
+
+
+def parse_start_time(value):
+    """
+    Session.start_time as an aware datetime (naive values are taken as UTC), or None if it
+    is not ISO 8601. Mirrors the seeding in migration_add_dashboard.sql.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def record_session_created(session, session_id, doctor_id, patient_id, status: str, start_time):
+    """
+    Counts a new session for its doctor and patient, in the caller's transaction.
+    """
+    started_at = parse_start_time(start_time)
+    patient_stmt = insert(DoctorPatientSummary).values(
+        doctor_id=doctor_id, patient_id=patient_id, session_count=1,
+        last_session_id=session_id, last_session_at=started_at,
+    )
+    newer = or_(
+        DoctorPatientSummary.last_session_at.is_(None),
+        patient_stmt.excluded.last_session_at >= DoctorPatientSummary.last_session_at,
+    )
+    result = await session.execute(
+        patient_stmt.on_conflict_do_update(
+            index_elements=[DoctorPatientSummary.doctor_id, DoctorPatientSummary.patient_id],
+            set_={
+                "session_count": DoctorPatientSummary.session_count + 1,
+                "last_session_id": case((newer, patient_stmt.excluded.last_session_id), else_=DoctorPatientSummary.last_session_id),
+                "last_session_at": case((newer, patient_stmt.excluded.last_session_at), else_=DoctorPatientSummary.last_session_at),
+            },
+        ).returning(literal_column("xmax = 0"))  # true when the row was inserted, i.e. a new patient
+    )
+    new_patient = 1 if result.scalar() else 0
+
+    status_column = STATUS_COLUMNS[status]
+    doctor_stmt = insert(DoctorDashboard).values(
+        doctor_id=doctor_id, session_count=1, patient_count=new_patient,
+        last_session_at=started_at, **{status_column.key: 1},
+    )
+    await session.execute(
+        doctor_stmt.on_conflict_do_update(
+            index_elements=[DoctorDashboard.doctor_id],
+            set_={
+                "session_count": DoctorDashboard.session_count + 1,
+                status_column.key: status_column + 1,
+                "patient_count": DoctorDashboard.patient_count + new_patient,
+                "last_session_at": func.greatest(DoctorDashboard.last_session_at, doctor_stmt.excluded.last_session_at),
+            },
+        )
+    )
+
+
+async def record_session_finished(session, session_id, status: str):
+    """
+    Moves a still-recording session to `status` ("completed" or "failed") once its
+    processing has ended, and between the status counters.
+    """
+    row = (await session.execute(
+        select(Session.doctor_id, Session.status).where(Session.id == session_id).with_for_update()
+    )).first()
+    if row is None or row.status != "recording":
+        return
+    await session.execute(update(Session).where(Session.id == session_id).values(status=status))
+    await publish(session, row.doctor_id, "session_status", {"sessionId": str(session_id), "status": status})
+
+    status_column = STATUS_COLUMNS[status]
+    await session.execute(
+        update(DoctorDashboard).where(DoctorDashboard.doctor_id == row.doctor_id).values(**{
+            "recording_count": DoctorDashboard.recording_count - 1,
+            status_column.key: status_column + 1,
+        })
+    )
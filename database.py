@@ -1,9 +1,88 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+from metrics import TimedAsyncQueuePool, instrument_engine
 from dotenv import load_dotenv
 load_dotenv()
 
-engine = create_async_engine(os.getenv("DATABASE_URL"), echo=True, future=True)
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+# Engine profile; defaults are tuned for production, override per deployment
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# asyncpg prepared-statement cache per connection; set to 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica used by read-only dashboard routes; falls back to the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+def build_engine(url: str, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW):
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+        poolclass=TimedAsyncQueuePool,
+    )
+    instrument_engine(engine)
+    return engine
+
+_engine = None
+_read_engine = None
+
+def get_engine():
+    """
+    Primary engine, created on first use so importing the app needs no DATABASE_URL.
+    """
+    global _engine
+    if _engine is None:
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is not set")
+        _engine = build_engine(DATABASE_URL)
+    return _engine
+
+def get_read_engine():
+    global _read_engine
+    if _read_engine is None:
+        _read_engine = build_engine(DATABASE_READ_URL) if DATABASE_READ_URL else get_engine()
+    return _read_engine
+
+class _LazySessionMaker:
+    """
+    Drop-in for sessionmaker(engine, ...) that binds to the engine on first call.
+    """
+    def __init__(self, engine_getter):
+        self._engine_getter = engine_getter
+        self._maker = None
+
+    def __call__(self, **kwargs):
+        if self._maker is None:
+            self._maker = sessionmaker(self._engine_getter(), expire_on_commit=False, class_=AsyncSession)
+        return self._maker(**kwargs)
+
+def __getattr__(name):
+    # `from database import engine` keeps working, without building it at import time
+    if name == "engine":
+        return get_engine()
+    if name == "read_engine":
+        return get_read_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+AsyncSessionLocal = _LazySessionMaker(get_engine)
+# Sessions for read-only routes (patient lists, session lists, patient details)
+AsyncReadSessionLocal = _LazySessionMaker(get_read_engine)
 Base = declarative_base()
@@ -0,0 +1,140 @@
+"""
+Per-doctor event fan-out over Postgres LISTEN/NOTIFY.
+
+Writers call `publish` inside their transaction, so an event is delivered only if the
+write commits. Each process holds a single LISTEN connection and forwards events to
+the in-memory queues of that doctor's connected clients, so every uvicorn worker sees
+events produced by any other worker or by `python jobs.py`. Other channels can share
+that connection through `EventHub.listen` (auth.py broadcasts token revocations this way).
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from sqlalchemy import func, select
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "medinote_events")
+# Events buffered per client before the client is told to resync
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+LISTEN_RECONNECT_DELAY = 2.0
+
+# Sent to a client whose queue overflowed; it should refetch state instead of trusting deltas
+RESYNC_EVENT = {"type": "resync", "data": {}}
+
+
+async def publish(session, doctor_id, event_type: str, data: dict):
+    """
+    Queues an event for the doctor's clients as part of the caller's transaction.
+    """
+    payload = json.dumps({"doctor_id": str(doctor_id), "type": event_type, "data": data}, default=str)
+    await session.execute(select(func.pg_notify(EVENTS_CHANNEL, payload)))
+
+
+class EventHub:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.subscribers = defaultdict(set)
+        self.channels = {EVENTS_CHANNEL: self.dispatch}
+        self.on_connect = []
+        self._listener = None
+
+    def listen(self, channel: str, handler, on_connect=None):
+        """
+        Also passes every payload on `channel` to `handler(payload)`. `await on_connect()`
+        runs each time the listener (re)connects, after LISTEN, to catch up on anything
+        sent while it was not listening. Call before start().
+        """
+        self.channels[channel] = handler
+        if on_connect is not None:
+            self.on_connect.append(on_connect)
+
+    def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    def subscribe(self, doctor_id: str) -> asyncio.Queue:
+        self.start()
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.subscribers[doctor_id].add(queue)
+        return queue
+
+    def unsubscribe(self, doctor_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(doctor_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[doctor_id]
+
+    def dispatch(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        event = {"type": message.get("type"), "data": message.get("data", {})}
+        for queue in list(self.subscribers.get(message.get("doctor_id"), ())):
+            self._offer(queue, event)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client: drop its backlog and ask it to resync
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC_EVENT)
+
+    async def _listen(self):
+        import asyncpg
+        reconnecting = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                for channel, handler in self.channels.items():
+                    await connection.add_listener(channel, lambda conn, pid, ch, payload, handler=handler: handler(payload))
+                for catch_up in self.on_connect:
+                    try:
+                        await catch_up()
+                    except Exception:
+                        # Keep delivering events even if one catch-up fails
+                        logger.exception("Listener catch-up failed")
+                if reconnecting:
+                    # Events may have been missed while disconnected
+                    for queues in list(self.subscribers.values()):
+                        for queue in list(queues):
+                            self._offer(queue, RESYNC_EVENT)
+                while not connection.is_closed():
+                    await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event listener connection failed; reconnecting")
+            finally:
+                reconnecting = True
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+
+_hub = None
+
+
+def get_event_hub() -> EventHub:
+    global _hub
+    if _hub is None:
+        # asyncpg takes a plain postgresql:// DSN, without the SQLAlchemy driver suffix
+        dsn = os.getenv("DATABASE_URL", "").replace("postgresql+asyncpg://", "postgresql://")
+        _hub = EventHub(dsn)
+    return _hub
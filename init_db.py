@@ -0,0 +1,23 @@
+"""
+Creates any missing tables and indexes from models.py, plus the /v1/changes triggers
+(models.SYNC_TRACKING_DDL), which are re-created on every run.
+
+Schema management runs here (or through the migration_*.sql scripts) rather than in
+every API process at startup:
+
+    python init_db.py
+"""
+import asyncio
+from database import get_engine, Base
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+
+async def main():
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
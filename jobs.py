@@ -0,0 +1,240 @@
+"""
+Postgres-backed queue for post-upload processing.
+
+A job is enqueued when the last chunk of a session is reported. Workers claim jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers (in this process or in other
+uvicorn workers / `python jobs.py`) can share the table without handing out a job twice.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update, or_, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+from database import AsyncSessionLocal
+from models import ProcessingJob, Session
+from events import publish
+from dashboard import record_session_finished
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Workers per `model` value, e.g. "default=2,whisper-large=4". The "default" pool
+# handles every model that has no entry of its own.
+JOB_CONCURRENCY = os.getenv("JOB_CONCURRENCY", "default=2")
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "5"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "600"))
+# A running job whose lease expires (worker died) becomes claimable again
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+
+# Async callables `stage(session_id, job)` run in order for every job
+PROCESSING_STAGES = []
+
+
+def register_stage(stage):
+    PROCESSING_STAGES.append(stage)
+    return stage
+
+
+def load_stages():
+    """
+    Imports the modules that register processing stages.
+    """
+    import recordings  # noqa: F401
+    import notes  # noqa: F401
+
+
+def parse_concurrency(spec: str) -> dict:
+    pools = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, count = item.partition("=")
+        pools[name.strip()] = max(int(count or 1), 0)
+    pools.setdefault("default", 1)
+    return pools
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(JOB_BACKOFF_BASE * (2 ** max(attempts - 1, 0)), JOB_BACKOFF_MAX)
+
+
+async def set_transcript_status(session, session_id, status: str):
+    """
+    Updates a session's transcript_status and notifies the owning doctor's clients.
+    """
+    result = await session.execute(
+        update(Session).where(Session.id == session_id).values(transcript_status=status).returning(Session.doctor_id)
+    )
+    doctor_id = result.scalar()
+    if doctor_id is not None:
+        await publish(session, doctor_id, "transcript_status", {"sessionId": str(session_id), "transcriptStatus": status})
+
+
+async def enqueue_processing_job(session, session_id, model: str):
+    """
+    Queues processing for a session inside the caller's transaction and marks its
+    transcript as pending. Repeated calls for the same session are ignored.
+    """
+    await session.execute(
+        insert(ProcessingJob)
+        .values(session_id=session_id, model=model or "default", max_attempts=JOB_MAX_ATTEMPTS)
+        .on_conflict_do_nothing(index_elements=[ProcessingJob.session_id])
+    )
+    await set_transcript_status(session, session_id, "pending")
+
+
+async def claim_job(models: list = None, exclude: list = None):
+    """
+    Claims the oldest runnable job, optionally restricted to (or excluding) some models.
+    Returns the job or None.
+    """
+    now = datetime.now(timezone.utc)
+    query = (
+        select(ProcessingJob)
+        .where(
+            ProcessingJob.run_after <= now,
+            or_(
+                ProcessingJob.status == "queued",
+                # Lease expired: the worker that held it is gone
+                ProcessingJob.status == "running",
+            )
+        )
+        .order_by(ProcessingJob.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if models:
+        query = query.where(ProcessingJob.model.in_(models))
+    if exclude:
+        query = query.where(ProcessingJob.model.notin_(exclude))
+
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            job = (await session.execute(query)).scalars().first()
+            if job is None:
+                return None
+            job.status = "running"
+            job.attempts += 1
+            job.run_after = now + timedelta(seconds=JOB_LEASE_SECONDS)
+        return job
+
+
+async def run_job(job):
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await set_transcript_status(session, job.session_id, "processing")
+    try:
+        for stage in PROCESSING_STAGES:
+            await stage(job.session_id, job)
+    except Exception as e:
+        logger.exception("Processing job %s failed (attempt %s)", job.id, job.attempts)
+        await fail_job(job, e)
+        return
+
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            # No built-in stage transcribes; the transcript is written by whatever does.
+            # Without one, clients keep waiting rather than being sent to a 404.
+            has_transcript = (await session.execute(
+                select(func.coalesce(Session.transcript, "") != "").where(Session.id == job.session_id)
+            )).scalar()
+            await set_transcript_status(session, job.session_id, "completed" if has_transcript else "pending")
+            await record_session_finished(session, job.session_id, "completed")
+            await session.execute(
+                update(ProcessingJob).where(ProcessingJob.id == job.id).values(status="done", last_error=None)
+            )
+
+
+async def fail_job(job, error: Exception):
+    retry = job.attempts < job.max_attempts
+    run_after = datetime.now(timezone.utc) + timedelta(seconds=backoff_delay(job.attempts))
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(
+                update(ProcessingJob).where(ProcessingJob.id == job.id).values(
+                    status="queued" if retry else "failed",
+                    run_after=run_after,
+                    last_error=str(error)[:2000],
+                )
+            )
+            if retry:
+                await set_transcript_status(session, job.session_id, "pending")
+            else:
+                # Out of attempts: tell clients to stop waiting
+                await set_transcript_status(session, job.session_id, "failed")
+                await record_session_finished(session, job.session_id, "failed")
+
+
+class JobWorkerPool:
+    """
+    Runs one asyncio task per worker slot; slots are grouped per model as configured
+    by JOB_CONCURRENCY.
+    """
+    def __init__(self, concurrency: str = JOB_CONCURRENCY):
+        self.pools = parse_concurrency(concurrency)
+        self.tasks = []
+        self._stopping = asyncio.Event()
+
+    def start(self):
+        load_stages()
+        named = [m for m in self.pools if m != "default"]
+        for model, count in self.pools.items():
+            for _ in range(count):
+                if model == "default":
+                    worker = self._worker(models=None, exclude=named)
+                else:
+                    worker = self._worker(models=[model], exclude=None)
+                self.tasks.append(asyncio.create_task(worker))
+
+    async def stop(self):
+        self._stopping.set()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        from notes import close_note_generator
+        await close_note_generator()
+
+    async def _worker(self, models, exclude):
+        while not self._stopping.is_set():
+            try:
+                job = await claim_job(models=models, exclude=exclude)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Could not claim processing job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The lease makes the job claimable again once it expires
+                logger.exception("Processing job %s could not be completed", job.id)
+
+
+async def _main():
+    pool = JobWorkerPool()
+    pool.start()
+    try:
+        await asyncio.gather(*pool.tasks)
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Run through the importable module: stage modules register against `jobs`, not `__main__`
+    import jobs
+    asyncio.run(jobs._main())
@@ -3,11 +3,28 @@ from routers.doctor import router as doctor_router
 from routers.patient import router as patient_router
 from routers.cloud import router as cloud_router
 from routers.audio import router as audio_router
+from routers.session import router as session_router
+from routers.search import router as search_router
+from routers.sync import router as sync_router
+from routers.stream import router as stream_router
+from routers.dashboard import router as dashboard_router
+from routers.export import router as export_router
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import get_engine, get_read_engine, Base
+from storage import get_storage
+from sqlalchemy import text
+from jobs import JobWorkerPool
+from events import get_event_hub
+from auth import REVOCATIONS_CHANNEL, apply_revocation, load_revocations
+from cache import CACHE_INVALIDATION_CHANNEL, apply_invalidation, clear_local_cache
+from metrics import MetricsMiddleware, render_metrics, monitor_event_loop_lag
+import asyncio
+import os
 
-app = FastAPI(title="MediNote API")
+# orjson serializes the large list payloads much faster than the stdlib encoder
+app = FastAPI(title="MediNote API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -17,22 +34,84 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(MetricsMiddleware)
+
+# Schema is managed with `python init_db.py` / migration_*.sql; opt in here only for local dev
+DB_CREATE_ALL_ON_STARTUP = os.getenv("DB_CREATE_ALL_ON_STARTUP", "false").lower() == "true"
+READY_CHECK_TIMEOUT = float(os.getenv("READY_CHECK_TIMEOUT", "2"))
 
 @app.on_event("startup")
 async def on_startup():
-    # Create tables if they don't exist
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if DB_CREATE_ALL_ON_STARTUP:
+        async with get_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    # Every worker listens for token revocations and cache invalidations made by the others
+    hub = get_event_hub()
+    hub.listen(REVOCATIONS_CHANNEL, apply_revocation, on_connect=load_revocations)
+    hub.listen(CACHE_INVALIDATION_CHANNEL, apply_invalidation, on_connect=clear_local_cache)
+    hub.start()
+    # Post-upload processing workers; disable to run them separately with `python jobs.py`
+    if os.getenv("JOB_WORKERS_ENABLED", "true").lower() == "true":
+        app.state.job_workers = JobWorkerPool()
+        app.state.job_workers.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.loop_lag_monitor.cancel()
+    if getattr(app.state, "job_workers", None):
+        await app.state.job_workers.stop()
+    await get_event_hub().close()
 
 app.include_router(doctor_router)
 app.include_router(patient_router)
 app.include_router(cloud_router)
 app.include_router(audio_router)
+app.include_router(session_router)
+app.include_router(search_router)
+app.include_router(sync_router)
+app.include_router(stream_router)
+app.include_router(dashboard_router)
+app.include_router(export_router)
 
 @app.get("/health")
 async def health_check():
+    # Liveness only: no dependencies are touched
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness: the database pool(s) and the storage backend answer within READY_CHECK_TIMEOUT.
+    """
+    async def check_engine(engine):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    checks = {"database": lambda: check_engine(get_engine()), "storage": lambda: get_storage().ping()}
+    results = {}
+    try:
+        if get_read_engine() is not get_engine():
+            checks["read_database"] = lambda: check_engine(get_read_engine())
+    except Exception as e:
+        # Engine creation itself failed (e.g. a malformed URL); report it rather than 500
+        results["read_database"] = f"error: {e.__class__.__name__}"
+
+    for name, check in checks.items():
+        try:
+            await asyncio.wait_for(check(), timeout=READY_CHECK_TIMEOUT)
+            results[name] = "ok"
+        except Exception as e:
+            results[name] = f"error: {e.__class__.__name__}"
+    ready = all(result == "ok" for result in results.values())
+    return ORJSONResponse({"status": "ready" if ready else "unavailable", "checks": results},
+                          status_code=200 if ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,181 @@
+"""
+Lightweight Prometheus metrics: request latency per route, in-flight requests, status
+counts, per-query database timing tagged by route, pool checkout wait and event-loop lag.
+
+Everything is plain dict/list arithmetic on the event-loop thread, so recording a sample
+costs a few microseconds; /metrics renders the text exposition format on demand.
+"""
+import asyncio
+import bisect
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.routing import Match
+
+# Route template of the request being served ("" outside requests, e.g. job workers)
+current_route: ContextVar[str] = ContextVar("current_route", default="")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labelnames = name, help, labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    def set(self, *labels, value):
+        self.values[labels] = value
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labels
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.values = {}
+
+    def observe(self, *labels, value):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route.", ("method", "route"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.", ("method", "route"))
+RESPONSES = Counter("http_responses_total", "Responses by route and status code.", ("method", "route", "status"))
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database query latency by route.", ("route",), QUERY_BUCKETS)
+QUERY_ROWS = Histogram("db_query_rows", "Rows returned or affected per query, by route.", ("route",), ROW_BUCKETS)
+POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", (), QUERY_BUCKETS)
+LOOP_LAG = Histogram("event_loop_lag_seconds", "Delay of a periodic event-loop tick beyond its schedule.", (), QUERY_BUCKETS)
+
+REGISTRY = [REQUEST_LATENCY, REQUESTS_IN_FLIGHT, RESPONSES, QUERY_LATENCY, QUERY_ROWS, POOL_WAIT, LOOP_LAG]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def _route_template(scope) -> str:
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, in-flight count and status per route template.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        route = _route_template(scope)
+        token = current_route.set(route)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.observe(method, route, value=time.perf_counter() - start)
+            REQUESTS_IN_FLIGHT.dec(method, route)
+            RESPONSES.inc(method, route, str(status[0]))
+            current_route.reset(token)
+
+
+def instrument_engine(engine):
+    """
+    Records per-query latency and row counts, tagged with the current route.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        route = current_route.get()
+        QUERY_LATENCY.observe(route, value=time.perf_counter() - context._query_start)
+        rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else 0
+        QUERY_ROWS.observe(route, value=rowcount)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a connection.
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(value=time.perf_counter() - start)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(value=max(loop.time() - expected, 0.0))
@@ -0,0 +1,16 @@
+-- Migration script: Chunk sizes and merged audio for GET /session/{id}/audio
+-- Run this script on your database before deploying the audio streaming endpoint
+
+\c medinote_db;
+
+-- Filled in from storage the first time a session's audio is streamed
+ALTER TABLE audio_chunk ADD COLUMN IF NOT EXISTS size_bytes BIGINT;
+
+-- Set by the merge stage when MERGE_AUDIO_ON_COMPLETE=true
+ALTER TABLE session ADD COLUMN IF NOT EXISTS merged_audio_path TEXT;
+
+-- Chunks are read back in chunk_number order; the unique (session_id, chunk_number)
+-- constraint from migration_chunk_ledger.sql already provides that index
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
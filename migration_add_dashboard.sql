@@ -0,0 +1,75 @@
+-- Migration script: Summary tables behind GET /v1/dashboard
+-- Run this script on your database before deploying the dashboard endpoint. It seeds the
+-- summaries from existing sessions; from then on the API keeps them up to date (dashboard.py).
+-- Safe to re-run: the summaries are rebuilt from scratch.
+
+\c medinote_db;
+
+CREATE TABLE IF NOT EXISTS doctor_dashboard (
+    doctor_id UUID PRIMARY KEY REFERENCES doctor(id) ON DELETE CASCADE,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    recording_count INTEGER NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    failed_count INTEGER NOT NULL DEFAULT 0,
+    patient_count INTEGER NOT NULL DEFAULT 0,
+    last_session_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS doctor_patient_summary (
+    doctor_id UUID NOT NULL REFERENCES doctor(id) ON DELETE CASCADE,
+    patient_id UUID NOT NULL REFERENCES patient(id) ON DELETE CASCADE,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    last_session_id UUID,
+    last_session_at TIMESTAMPTZ,
+    PRIMARY KEY (doctor_id, patient_id)
+);
+
+-- Matches the /v1/dashboard ordering (last_session_at DESC NULLS LAST)
+CREATE INDEX IF NOT EXISTS ix_doctor_patient_summary_recent ON doctor_patient_summary(doctor_id, last_session_at DESC NULLS LAST);
+
+-- Same rules as dashboard.parse_start_time: ISO 8601, naive values taken as UTC, anything else NULL
+CREATE OR REPLACE FUNCTION session_start_at(value TEXT) RETURNS TIMESTAMPTZ AS $$
+BEGIN
+    IF value IS NULL OR value !~ '^\s*\d{4}-\d{2}-\d{2}' THEN
+        RETURN NULL;
+    END IF;
+    RETURN value::timestamptz;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Seed from existing sessions
+BEGIN;
+SET LOCAL timezone = 'UTC';
+
+TRUNCATE doctor_patient_summary, doctor_dashboard;
+
+INSERT INTO doctor_patient_summary (doctor_id, patient_id, session_count, last_session_id, last_session_at)
+SELECT DISTINCT ON (doctor_id, patient_id)
+    doctor_id,
+    patient_id,
+    count(*) OVER (PARTITION BY doctor_id, patient_id),
+    id,
+    session_start_at(start_time::text)
+FROM session
+ORDER BY doctor_id, patient_id, session_start_at(start_time::text) DESC NULLS LAST;
+
+INSERT INTO doctor_dashboard (doctor_id, session_count, recording_count, completed_count, failed_count,
+                              patient_count, last_session_at)
+SELECT
+    doctor_id,
+    count(*),
+    count(*) FILTER (WHERE status = 'recording'),
+    count(*) FILTER (WHERE status = 'completed'),
+    count(*) FILTER (WHERE status = 'failed'),
+    count(DISTINCT patient_id),
+    max(session_start_at(start_time::text))
+FROM session
+GROUP BY doctor_id;
+
+COMMIT;
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
@@ -0,0 +1,23 @@
+-- Migration script: Add processing_job table for the post-upload processing queue
+-- Run this script on your database to enable the job workers in jobs.py
+
+\c medinote_db;
+
+CREATE TABLE IF NOT EXISTS processing_job (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id UUID NOT NULL UNIQUE REFERENCES session(id) ON DELETE CASCADE,
+    model VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Workers claim the oldest runnable job per model
+CREATE INDEX IF NOT EXISTS ix_processing_job_claim ON processing_job(status, model, run_after);
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
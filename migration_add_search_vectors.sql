@@ -0,0 +1,20 @@
+-- Migration script: Add full-text search columns and indexes for /v1/search
+-- Run this script on your database before enabling the search endpoint
+
+\c medinote_db;
+
+-- Generated columns are recomputed by Postgres on every insert/update
+ALTER TABLE patient ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '') || ' ' || coalesce(email, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(background, '') || ' ' || coalesce(medical_history, '') || ' ' ||
+        coalesce(family_history, '') || ' ' || coalesce(social_history, '') || ' ' || coalesce(previous_treatment, '')), 'B')
+) STORED;
+
+ALTER TABLE session ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(session_title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(session_summary, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(transcript, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_patient_search ON patient USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS ix_session_search ON session USING GIN (search_vector);
@@ -0,0 +1,55 @@
+-- Migration script: Add modification tracking and tombstones for /v1/changes
+-- Run this script on your database before enabling delta sync
+
+\c medinote_db;
+
+ALTER TABLE patient ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE session ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE template ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS ix_patient_doctor_updated ON patient(doctor_id, updated_at);
+CREATE INDEX IF NOT EXISTS ix_session_doctor_updated ON session(doctor_id, updated_at);
+CREATE INDEX IF NOT EXISTS ix_template_doctor_updated ON template(doctor_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS deleted_record (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    record_id UUID NOT NULL,
+    doctor_id UUID,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_deleted_record_doctor_deleted ON deleted_record(doctor_id, deleted_at);
+
+-- Keep updated_at current for writes that bypass the ORM
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Record a tombstone for every deleted row, including cascaded deletes
+CREATE OR REPLACE FUNCTION record_deletion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO deleted_record (table_name, record_id, doctor_id) VALUES (TG_TABLE_NAME, OLD.id, OLD.doctor_id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS patient_set_updated_at ON patient;
+CREATE TRIGGER patient_set_updated_at BEFORE UPDATE ON patient FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+DROP TRIGGER IF EXISTS session_set_updated_at ON session;
+CREATE TRIGGER session_set_updated_at BEFORE UPDATE ON session FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+DROP TRIGGER IF EXISTS template_set_updated_at ON template;
+CREATE TRIGGER template_set_updated_at BEFORE UPDATE ON template FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS patient_record_deletion ON patient;
+CREATE TRIGGER patient_record_deletion AFTER DELETE ON patient FOR EACH ROW EXECUTE FUNCTION record_deletion();
+DROP TRIGGER IF EXISTS session_record_deletion ON session;
+CREATE TRIGGER session_record_deletion AFTER DELETE ON session FOR EACH ROW EXECUTE FUNCTION record_deletion();
+DROP TRIGGER IF EXISTS template_record_deletion ON template;
+CREATE TRIGGER template_record_deletion AFTER DELETE ON template FOR EACH ROW EXECUTE FUNCTION record_deletion();
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
+GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO medinote_user;
@@ -0,0 +1,15 @@
+-- Migration script: Add token_revocation table so refresh-token revocations survive restarts
+-- Run this script on your database before deploying the revocation broadcast in auth.py
+
+\c medinote_db;
+
+CREATE TABLE IF NOT EXISTS token_revocation (
+    key VARCHAR(64) PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Expired revocations are purged by expiry time
+CREATE INDEX IF NOT EXISTS ix_token_revocation_expires ON token_revocation(expires_at);
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
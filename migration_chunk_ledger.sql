@@ -0,0 +1,41 @@
+-- Migration script: Integer chunk numbers, idempotent chunk notifications and the per-session chunk ledger
+-- Run this script on your database before deploying the /v1/sessions/{id}/missing-chunks endpoint
+
+\c medinote_db;
+
+-- Databases created from models.py before this change stored these columns as text
+ALTER TABLE audio_chunk ALTER COLUMN chunk_number TYPE INTEGER USING chunk_number::integer;
+ALTER TABLE chunk_upload_notification ALTER COLUMN chunk_number TYPE INTEGER USING chunk_number::integer;
+ALTER TABLE chunk_upload_notification ALTER COLUMN total_chunks_client TYPE INTEGER USING NULLIF(total_chunks_client::text, '')::integer;
+ALTER TABLE chunk_upload_notification ALTER COLUMN is_last TYPE BOOLEAN USING is_last::text IN ('true', 'True', '1', 't');
+
+-- Drop rows duplicated by client retries, keeping one per chunk
+DELETE FROM audio_chunk a USING audio_chunk b
+WHERE a.session_id = b.session_id AND a.chunk_number = b.chunk_number AND a.ctid > b.ctid;
+DELETE FROM chunk_upload_notification a USING chunk_upload_notification b
+WHERE a.session_id = b.session_id AND a.chunk_number = b.chunk_number AND a.ctid > b.ctid;
+
+-- Guarded so the script can be re-run
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uix_audio_chunk_session_chunk') THEN
+        ALTER TABLE audio_chunk
+            ADD CONSTRAINT uix_audio_chunk_session_chunk UNIQUE (session_id, chunk_number);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uix_chunk_notification_session_chunk') THEN
+        ALTER TABLE chunk_upload_notification
+            ADD CONSTRAINT uix_chunk_notification_session_chunk UNIQUE (session_id, chunk_number);
+    END IF;
+END $$;
+
+-- Received chunks per session; existing sessions get a row on their next notification
+CREATE TABLE IF NOT EXISTS session_chunk_ledger (
+    session_id UUID PRIMARY KEY REFERENCES session(id) ON DELETE CASCADE,
+    total_chunks INTEGER,
+    received_count INTEGER NOT NULL DEFAULT 0,
+    received_bitmap BYTEA NOT NULL DEFAULT '\x',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
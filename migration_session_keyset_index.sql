@@ -0,0 +1,8 @@
+-- Migration script: Add index backing keyset pagination of /session/all-session
+-- Run this script on your database after deploying the paginated endpoint
+
+\c medinote_db;
+
+-- Sessions are listed per doctor ordered by (start_time DESC NULLS LAST, id DESC); the index
+-- must match that exactly, NULLS LAST included, or Postgres sorts every row of the doctor.
+CREATE INDEX IF NOT EXISTS ix_session_doctor_start_id ON session(doctor_id, start_time DESC NULLS LAST, id DESC);
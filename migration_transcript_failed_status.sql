@@ -0,0 +1,11 @@
+-- Migration script: Allow transcript_status = 'failed'
+-- Jobs that exhaust their attempts now mark the transcript failed instead of leaving it pending
+
+\c medinote_db;
+
+ALTER TABLE session DROP CONSTRAINT IF EXISTS session_transcript_status_check;
+ALTER TABLE session ADD CONSTRAINT session_transcript_status_check
+    CHECK (transcript_status IN ('pending', 'processing', 'completed', 'failed'));
+
+-- Grant permissions to the user
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO medinote_user;
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Date, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, ForeignKey, Date, UniqueConstraint, Index, Integer, BigInteger, Boolean, DateTime, Computed, LargeBinary, DDL, event, func, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 import uuid
+from sqlalchemy.orm import deferred
 from database import Base
 
 class Doctor(Base):
@@ -13,7 +14,11 @@ class Doctor(Base):
 
 class Patient(Base):
     __tablename__ = "patient"
-    __table_args__ = (UniqueConstraint('doctor_id', 'email', name='uix_doctor_email'),)
+    __table_args__ = (
+        UniqueConstraint('doctor_id', 'email', name='uix_doctor_email'),
+        Index('ix_patient_search', 'search_vector', postgresql_using='gin'),
+        Index('ix_patient_doctor_updated', 'doctor_id', 'updated_at'),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctor.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(100), nullable=False)
@@ -27,55 +32,192 @@ class Patient(Base):
     family_history = Column(Text)
     social_history = Column(Text)
     previous_treatment = Column(Text)
+    # Full-text search document, maintained by Postgres on every write (see routers/search.py)
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(name, '') || ' ' || coalesce(email, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(background, '') || ' ' || coalesce(medical_history, '') || ' ' || "
+        "coalesce(family_history, '') || ' ' || coalesce(social_history, '') || ' ' || coalesce(previous_treatment, '')), 'B')",
+        persisted=True
+    )))
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
 
 # Template Table
 class Template(Base):
     __tablename__ = "template"
+    __table_args__ = (Index('ix_template_doctor_updated', 'doctor_id', 'updated_at'),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctor.id", ondelete="CASCADE"), nullable=True)
     title = Column(String(100), nullable=False)
     type = Column(String(20), nullable=False)  # 'default', 'predefined', 'custom'
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
 
 # Session Table
 class Session(Base):
     __tablename__ = "session"
+    # Backs keyset pagination in /session/all-session
+    __table_args__ = (
+        Index('ix_session_doctor_start_id', 'doctor_id', text('start_time DESC NULLS LAST'), text('id DESC')),
+        Index('ix_session_search', 'search_vector', postgresql_using='gin'),
+        Index('ix_session_doctor_updated', 'doctor_id', 'updated_at'),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctor.id", ondelete="CASCADE"), nullable=False)
     patient_id = Column(UUID(as_uuid=True), ForeignKey("patient.id", ondelete="CASCADE"), nullable=False)
     template_id = Column(UUID(as_uuid=True), ForeignKey("template.id"), nullable=True)
     session_title = Column(String(150))
-    session_summary = Column(Text)
+    # Large text columns load only when asked for (undefer / explicit column select)
+    session_summary = deferred(Column(Text))
     transcript_status = Column(String(20))
-    transcript = Column(Text)
+    transcript = deferred(Column(Text))
     status = Column(String(20))
     date = Column(String(10))  # Use String for date, or Date if imported
     start_time = Column(String(30))  # Use String for timestamp, or DateTime if imported
     end_time = Column(String(30))
     duration = Column(String(50))  # Use String for interval, or Interval if imported
+    # Storage path of the chunks merged into one object, when MERGE_AUDIO_ON_COMPLETE is on
+    merged_audio_path = Column(Text)
+    # Full-text search document, maintained by Postgres on every write (see routers/search.py)
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(session_title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(session_summary, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(transcript, '')), 'C')",
+        persisted=True
+    )))
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# Tombstones for deleted patients, sessions and templates, written by database triggers
+# (SYNC_TRACKING_DDL below / migration_add_sync_tracking.sql) so cascaded deletes are captured too
+class DeletedRecord(Base):
+    __tablename__ = "deleted_record"
+    __table_args__ = (Index('ix_deleted_record_doctor_deleted', 'doctor_id', 'deleted_at'),)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    record_id = Column(UUID(as_uuid=True), nullable=False)
+    doctor_id = Column(UUID(as_uuid=True))  # NULL for global templates
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# The triggers from migration_add_sync_tracking.sql, so `create_all` (init_db.py) installs
+# them too. One statement per DDL: asyncpg does not accept several in one execute.
+SYNC_TRACKING_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = now();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION record_deletion() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO deleted_record (table_name, record_id, doctor_id) VALUES (TG_TABLE_NAME, OLD.id, OLD.doctor_id);
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+for _table in ("patient", "session", "template"):
+    SYNC_TRACKING_DDL += [
+        f"DROP TRIGGER IF EXISTS {_table}_set_updated_at ON {_table}",
+        f"CREATE TRIGGER {_table}_set_updated_at BEFORE UPDATE ON {_table} "
+        f"FOR EACH ROW EXECUTE FUNCTION set_updated_at()",
+        f"DROP TRIGGER IF EXISTS {_table}_record_deletion ON {_table}",
+        f"CREATE TRIGGER {_table}_record_deletion AFTER DELETE ON {_table} "
+        f"FOR EACH ROW EXECUTE FUNCTION record_deletion()",
+    ]
+for _statement in SYNC_TRACKING_DDL:
+    event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
 
 
 # Audio Chunk Table
 class AudioChunk(Base):
     __tablename__ = "audio_chunk"
+    # Retried notifications for the same chunk are dropped with ON CONFLICT DO NOTHING
+    __table_args__ = (UniqueConstraint('session_id', 'chunk_number', name='uix_audio_chunk_session_chunk'),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("session.id", ondelete="CASCADE"), nullable=False)
-    chunk_number = Column(String(10), nullable=False)
+    chunk_number = Column(Integer, nullable=False)
     gcs_path = Column(Text, nullable=False)
     public_url = Column(Text)
     mime_type = Column(String(50))
+    size_bytes = Column(BigInteger)  # filled in from storage the first time the audio is streamed
     upload_time = Column(String(30))
 
 
 # Chunk Upload Notification Table
 class ChunkUploadNotification(Base):
     __tablename__ = "chunk_upload_notification"
+    __table_args__ = (UniqueConstraint('session_id', 'chunk_number', name='uix_chunk_notification_session_chunk'),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("session.id", ondelete="CASCADE"), nullable=False)
-    chunk_number = Column(String(10), nullable=False)
-    total_chunks_client = Column(String(10))
-    is_last = Column(String(5))
+    chunk_number = Column(Integer, nullable=False)
+    total_chunks_client = Column(Integer)
+    is_last = Column(Boolean)
     selected_template_id = Column(UUID(as_uuid=True), ForeignKey("template.id"), nullable=True)
     model = Column(String(50))
     notified_at = Column(String(30))
+
+
+# Received chunks per session, updated in the notify transaction (see routers/audio.py)
+class SessionChunkLedger(Base):
+    __tablename__ = "session_chunk_ledger"
+    session_id = Column(UUID(as_uuid=True), ForeignKey("session.id", ondelete="CASCADE"), primary_key=True)
+    total_chunks = Column(Integer)  # from totalChunksClient, or the last chunk's number
+    received_count = Column(Integer, nullable=False, default=0)
+    # Bit (n - 1) is set once chunk n has been notified, least significant bit first
+    received_bitmap = Column(LargeBinary, nullable=False, default=b"")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# Per-doctor totals for /v1/dashboard, maintained incrementally by dashboard.py
+class DoctorDashboard(Base):
+    __tablename__ = "doctor_dashboard"
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctor.id", ondelete="CASCADE"), primary_key=True)
+    session_count = Column(Integer, nullable=False, default=0)
+    recording_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    patient_count = Column(Integer, nullable=False, default=0)  # patients with at least one session
+    last_session_at = Column(DateTime(timezone=True))  # parsed from Session.start_time (see dashboard.py)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# Per-patient totals for /v1/dashboard, maintained incrementally by dashboard.py
+class DoctorPatientSummary(Base):
+    __tablename__ = "doctor_patient_summary"
+    # Matches the /v1/dashboard ordering (last_session_at DESC NULLS LAST)
+    __table_args__ = (Index('ix_doctor_patient_summary_recent', 'doctor_id', text('last_session_at DESC NULLS LAST')),)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctor.id", ondelete="CASCADE"), primary_key=True)
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patient.id", ondelete="CASCADE"), primary_key=True)
+    session_count = Column(Integer, nullable=False, default=0)
+    last_session_id = Column(UUID(as_uuid=True))
+    last_session_at = Column(DateTime(timezone=True))
+
+
+# Post-upload processing job, claimed by workers with FOR UPDATE SKIP LOCKED (see jobs.py)
+class ProcessingJob(Base):
+    __tablename__ = "processing_job"
+    __table_args__ = (Index('ix_processing_job_claim', 'status', 'model', 'run_after'),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("session.id", ondelete="CASCADE"), nullable=False, unique=True)
+    model = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # 'queued', 'running', 'done', 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# Revoked refresh-token ids and families (see auth.py). The check runs against an
+# in-memory copy; this table lets a worker that starts or reconnects catch up.
+class TokenRevocation(Base):
+    __tablename__ = "token_revocation"
+    __table_args__ = (Index('ix_token_revocation_expires', 'expires_at'),)
+    key = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
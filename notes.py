@@ -0,0 +1,309 @@
+"""
+Note generation: a transcript plus a template in, sectioned note text out.
+
+Generators implement `NoteGenerator.generate_many`. The built-in KeywordNoteGenerator
+files each transcript sentence under the template section whose keywords it matches
+best. The text processing runs on a process pool, so it never competes with request
+handling for the GIL. Concurrent `generate` calls (one per job worker) are gathered
+into batches, so many sessions share one round trip to the pool.
+
+Set NOTE_GENERATOR=package.module:Class to plug in another implementation.
+
+    python notes.py --backfill    # write notes for sessions that have a transcript but no summary
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+from database import AsyncSessionLocal
+from models import ChunkUploadNotification, Session, Template
+from jobs import register_stage
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+NOTE_GENERATOR = os.getenv("NOTE_GENERATOR", "keyword")
+NOTE_WORKERS = int(os.getenv("NOTE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Transcripts sent to a pool process at once, and how long to wait to fill a batch
+NOTE_BATCH_SIZE = int(os.getenv("NOTE_BATCH_SIZE", "16"))
+NOTE_BATCH_WINDOW = float(os.getenv("NOTE_BATCH_WINDOW", "0.05"))
+NOTES_ON_COMPLETE = os.getenv("NOTES_ON_COMPLETE", "true").lower() == "true"
+# Forking a threaded server can copy held locks into the children; start them cleanly
+NOTE_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class NoteTemplate(NamedTuple):
+    title: str
+    type: str = "default"
+
+
+# Section name -> keywords, per kind of template. Matched against the template title.
+SOAP_SECTIONS = {
+    "Subjective": ("complain", "complains", "pain", "feel", "feeling", "felt", "since", "days", "weeks", "history",
+                   "reports", "denies", "started", "worse", "better", "symptom", "symptoms", "ache", "tired"),
+    "Objective": ("exam", "examination", "blood", "pressure", "temperature", "pulse", "heart", "rate", "weight",
+                  "bp", "lungs", "clear", "tender", "swelling", "rash", "labs", "x-ray", "scan", "saturation"),
+    "Assessment": ("diagnosis", "likely", "consistent", "suspect", "impression", "probably", "infection",
+                   "condition", "rule", "differential", "assessment", "viral", "bacterial", "chronic"),
+    "Plan": ("prescribe", "prescribed", "start", "continue", "mg", "tablet", "dose", "follow", "return", "refer",
+             "referral", "advise", "advised", "test", "order", "schedule", "review", "plan", "daily"),
+}
+HISTORY_AND_PHYSICAL_SECTIONS = {
+    "Chief Complaint": ("complain", "complains", "here", "because", "concern", "problem"),
+    "History of Present Illness": ("since", "days", "weeks", "started", "worse", "better", "pain", "symptoms"),
+    "Past Medical History": ("history", "previous", "surgery", "diabetes", "hypertension", "asthma", "allergic",
+                             "allergy", "medication", "medications"),
+    "Physical Examination": SOAP_SECTIONS["Objective"],
+    "Assessment and Plan": SOAP_SECTIONS["Assessment"] + SOAP_SECTIONS["Plan"],
+}
+PROGRESS_SECTIONS = {
+    "Interval History": SOAP_SECTIONS["Subjective"],
+    "Findings": SOAP_SECTIONS["Objective"],
+    "Plan": SOAP_SECTIONS["Assessment"] + SOAP_SECTIONS["Plan"],
+}
+TEMPLATE_SECTIONS = (
+    (("history", "physical", "h&p", "admission"), HISTORY_AND_PHYSICAL_SECTIONS),
+    (("progress", "follow", "review"), PROGRESS_SECTIONS),
+)
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_RE = re.compile(r"[a-z][a-z&-]*")
+
+
+def template_sections(template: NoteTemplate) -> dict:
+    title = (template.title or "").lower()
+    for words, sections in TEMPLATE_SECTIONS:
+        if any(w in title for w in words):
+            return sections
+    return SOAP_SECTIONS
+
+
+def generate_note(transcript: str, template: NoteTemplate) -> str:
+    """
+    Files each sentence under the section sharing the most keywords with it; sentences
+    matching none go to the first section.
+    """
+    sections = template_sections(template)
+    names = list(sections)
+    keywords = [frozenset(sections[n]) for n in names]
+    filed = {n: [] for n in names}
+    for sentence in SENTENCE_RE.split(transcript or ""):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        words = set(WORD_RE.findall(sentence.lower()))
+        scores = [len(words & k) for k in keywords]
+        best = max(range(len(names)), key=scores.__getitem__) if any(scores) else 0
+        filed[names[best]].append(sentence)
+
+    lines = []
+    for name in names:
+        lines.append(f"{name}:")
+        if filed[name]:
+            lines.extend(f"- {s}" for s in filed[name])
+        else:
+            lines.append("- Not discussed.")
+        lines.append("")
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def generate_batch(items: Sequence[Tuple[str, NoteTemplate]]) -> List[str]:
+    # Runs in a pool process; must stay a module-level function so it can be pickled
+    return [generate_note(transcript, template) for transcript, template in items]
+
+
+class NoteGenerator(ABC):
+    """
+    Interface for note generation. Implementations override generate_many.
+    """
+    async def generate(self, transcript: str, template: NoteTemplate) -> str:
+        return (await self.generate_many([(transcript, template)]))[0]
+
+    @abstractmethod
+    async def generate_many(self, items: Sequence[Tuple[str, NoteTemplate]]) -> List[str]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class KeywordNoteGenerator(NoteGenerator):
+    def __init__(self, workers: int = NOTE_WORKERS, batch_size: int = NOTE_BATCH_SIZE,
+                 batch_window: float = NOTE_BATCH_WINDOW):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._executor = None
+        self._pending = []
+        self._flush_handle = None
+        # Running batches, held so they are not garbage-collected mid-flight
+        self._batches = set()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(NOTE_POOL_START_METHOD)
+            )
+        return self._executor
+
+    async def generate(self, transcript: str, template: NoteTemplate) -> str:
+        # Held back for up to batch_window so concurrent callers share one pool submission
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((transcript, template), future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run(self, pending):
+        try:
+            notes = await self.generate_many([item for item, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), note in zip(pending, notes):
+            if not future.done():
+                future.set_result(note)
+
+    async def generate_many(self, items: Sequence[Tuple[str, NoteTemplate]]) -> List[str]:
+        loop = asyncio.get_running_loop()
+        batches = [list(items[i:i + self.batch_size]) for i in range(0, len(items), self.batch_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self.executor, generate_batch, b) for b in batches))
+        return [note for batch in results for note in batch]
+
+    async def close(self):
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_generator: Optional[NoteGenerator] = None
+
+
+def get_note_generator() -> NoteGenerator:
+    global _generator
+    if _generator is None:
+        if NOTE_GENERATOR == "keyword":
+            _generator = KeywordNoteGenerator()
+        else:
+            module_name, _, class_name = NOTE_GENERATOR.partition(":")
+            _generator = getattr(importlib.import_module(module_name), class_name)()
+    return _generator
+
+
+async def close_note_generator():
+    """
+    Closes the shared generator, if one was created, and its process pool with it.
+    """
+    global _generator
+    if _generator is not None:
+        generator, _generator = _generator, None
+        await generator.close()
+
+
+def session_template_id():
+    """
+    The session's template, or else the template picked when its chunks were uploaded.
+    """
+    selected = (
+        select(ChunkUploadNotification.selected_template_id)
+        .where(ChunkUploadNotification.session_id == Session.id,
+               ChunkUploadNotification.selected_template_id.isnot(None))
+        .order_by(ChunkUploadNotification.chunk_number.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(Session.template_id, selected)
+
+
+def note_inputs_query():
+    return (
+        select(Session.id, Session.transcript, Template.title, Template.type)
+        .outerjoin(Template, Template.id == session_template_id())
+    )
+
+
+async def write_note(session_id, job):
+    """
+    Processing stage: generates the session's note from its transcript and template.
+    Sessions without a transcript are left alone.
+    """
+    async with AsyncSessionLocal() as session:
+        row = (await session.execute(note_inputs_query().where(Session.id == session_id))).first()
+    if row is None or not row.transcript:
+        return
+    note = await get_note_generator().generate(row.transcript, NoteTemplate(row.title or "", row.type or "default"))
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(update(Session).where(Session.id == session_id).values(session_summary=note))
+
+
+if NOTES_ON_COMPLETE:
+    register_stage(write_note)
+
+
+async def backfill(batch_size: int):
+    generator = get_note_generator()
+    done = 0
+    try:
+        while True:
+            async with AsyncSessionLocal() as session:
+                rows = (await session.execute(
+                    note_inputs_query()
+                    .where(Session.transcript.isnot(None), Session.transcript != "", Session.session_summary.is_(None))
+                    .limit(batch_size)
+                )).all()
+            if not rows:
+                break
+            notes = await generator.generate_many(
+                [(r.transcript, NoteTemplate(r.title or "", r.type or "default")) for r in rows]
+            )
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    await session.execute(
+                        update(Session),
+                        [{"id": r.id, "session_summary": note} for r, note in zip(rows, notes)],
+                    )
+            done += len(rows)
+            logger.info("Wrote %s notes", done)
+    finally:
+        await generator.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="generate missing notes")
+    parser.add_argument("--batch-size", type=int, default=200, help="sessions per database round trip")
+    args = parser.parse_args()
+    if args.backfill:
+        asyncio.run(backfill(args.batch_size))
+    else:
+        parser.print_help()
@@ -0,0 +1,148 @@
+"""
+Session audio as one continuous stream.
+
+A recording is stored as numbered chunk objects. Their bytes are concatenated in
+chunk_number order, the same way clients stitch them, so a byte offset into the
+recording maps onto (chunk, offset within chunk) using the chunk sizes. Sizes are
+read from storage once and kept on audio_chunk.size_bytes.
+
+With MERGE_AUDIO_ON_COMPLETE=true, a processing stage writes the concatenation to a
+single object once the last chunk has arrived, and later reads use that object.
+"""
+import asyncio
+import logging
+import os
+from typing import List, NamedTuple, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.future import select
+from database import AsyncSessionLocal
+from models import AudioChunk, Session, SessionChunkLedger
+from storage import get_storage, mime_extension
+from jobs import register_stage
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MERGE_AUDIO_ON_COMPLETE = os.getenv("MERGE_AUDIO_ON_COMPLETE", "false").lower() == "true"
+# Concurrent storage lookups when chunk sizes are not known yet
+SIZE_LOOKUP_CONCURRENCY = int(os.getenv("SIZE_LOOKUP_CONCURRENCY", "8"))
+
+DEFAULT_AUDIO_MIME_TYPE = "audio/webm"
+
+
+class AudioPart(NamedTuple):
+    path: str
+    size: int
+
+
+def merged_audio_path(session_id, mime_type: str) -> str:
+    return f"sessions/{session_id}/merged.{mime_extension(mime_type)}"
+
+
+def mime_type_for(path: str) -> str:
+    return f"audio/{path.rsplit('.', 1)[-1]}"
+
+
+async def fill_chunk_sizes(session, chunks) -> dict:
+    """
+    Looks up the sizes of chunks that have none recorded and stores them.
+    Returns {chunk id: size}. Raises FileNotFoundError if an object is missing.
+    """
+    missing = [c for c in chunks if c.size_bytes is None]
+    if not missing:
+        return {}
+    storage = get_storage()
+    semaphore = asyncio.Semaphore(SIZE_LOOKUP_CONCURRENCY)
+
+    async def lookup(chunk):
+        async with semaphore:
+            return await storage.size(chunk.gcs_path)
+
+    sizes = await asyncio.gather(*(lookup(c) for c in missing))
+    found = {c.id: size for c, size in zip(missing, sizes)}
+    await session.execute(update(AudioChunk), [{"id": k, "size_bytes": v} for k, v in found.items()])
+    await session.commit()
+    return found
+
+
+async def load_chunk_parts(session, session_id) -> Tuple[List[AudioPart], Optional[str]]:
+    """
+    The session's chunks in playback order, with their sizes, and the mime type of the first one.
+    """
+    result = await session.execute(
+        select(AudioChunk.id, AudioChunk.gcs_path, AudioChunk.mime_type, AudioChunk.size_bytes)
+        .where(AudioChunk.session_id == session_id)
+        .order_by(AudioChunk.chunk_number)
+    )
+    chunks = result.all()
+    if not chunks:
+        return [], None
+    sizes = await fill_chunk_sizes(session, chunks)
+    parts = [AudioPart(c.gcs_path, c.size_bytes if c.size_bytes is not None else sizes[c.id]) for c in chunks]
+    return parts, chunks[0].mime_type or DEFAULT_AUDIO_MIME_TYPE
+
+
+async def load_audio_parts(session, session_id, doctor_id):
+    """
+    Returns (parts, mime type) for a doctor's session: the merged object if there is
+    one, otherwise the chunks. Returns (None, None) if the session is not theirs.
+    """
+    result = await session.execute(
+        select(Session.merged_audio_path).where(Session.id == session_id, Session.doctor_id == doctor_id)
+    )
+    row = result.first()
+    if row is None:
+        return None, None
+    if row.merged_audio_path:
+        size = await get_storage().size(row.merged_audio_path)
+        return [AudioPart(row.merged_audio_path, size)], mime_type_for(row.merged_audio_path)
+    return await load_chunk_parts(session, session_id)
+
+
+async def stream_parts(parts: List[AudioPart], start: int, end: int):
+    """
+    Yields bytes start..end (inclusive) of the concatenated parts, reading only the
+    parts that overlap the range, one storage block at a time.
+    """
+    storage = get_storage()
+    offset = 0
+    for part in parts:
+        part_start, part_end = offset, offset + part.size - 1
+        offset += part.size
+        if part.size == 0 or part_end < start:
+            continue
+        if part_start > end:
+            break
+        async for block in storage.read_range(part.path, max(start, part_start) - part_start, min(end, part_end) - part_start):
+            yield block
+
+
+async def merge_session_audio(session_id, job):
+    """
+    Processing stage: writes the session's chunks to one object and records its path.
+    Sessions with gaps in their chunk ledger are left unmerged.
+    """
+    async with AsyncSessionLocal() as session:
+        ledger = (await session.execute(
+            select(SessionChunkLedger.total_chunks, SessionChunkLedger.received_count)
+            .where(SessionChunkLedger.session_id == session_id)
+        )).first()
+        if ledger and ledger.total_chunks and ledger.received_count < ledger.total_chunks:
+            logger.info("Not merging audio for session %s: %s of %s chunks received",
+                        session_id, ledger.received_count, ledger.total_chunks)
+            return
+        parts, mime_type = await load_chunk_parts(session, session_id)
+    total = sum(p.size for p in parts)
+    if not total:
+        return
+
+    path = merged_audio_path(session_id, mime_type)
+    await get_storage().write_stream(path, stream_parts(parts, 0, total - 1), content_type=mime_type)
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(update(Session).where(Session.id == session_id).values(merged_audio_path=path))
+
+
+if MERGE_AUDIO_ON_COMPLETE:
+    register_stage(merge_session_audio)
@@ -1,17 +1,55 @@
 from fastapi import APIRouter, HTTPException, Depends, Body
 from routers.utils import get_current_doctor
-from database import AsyncSessionLocal
-from models import AudioChunk, ChunkUploadNotification
+from database import AsyncSessionLocal, AsyncReadSessionLocal
+from models import AudioChunk, ChunkUploadNotification, Session, SessionChunkLedger
+from schemas import MissingChunksResponse
+from jobs import enqueue_processing_job
+from events import publish
+import os
 import uuid
+from typing import List
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
+from dotenv import load_dotenv
+load_dotenv()
 
 router = APIRouter(prefix="/v1", tags=["audio"])
 
-@router.post("/notify-chunk-uploaded")
-async def notify_chunk_uploaded(
-    payload: dict = Body(...),
-    token: str = Depends(get_current_doctor)
-):
+# Upper bound on chunk descriptors accepted by /notify-chunks-uploaded in one request
+MAX_CHUNKS_PER_BATCH = 500
+# Highest chunk number accepted; bounds the per-session ledger bitmap (10000 chunks = 1250 bytes)
+MAX_CHUNKS_PER_SESSION = int(os.getenv("MAX_CHUNKS_PER_SESSION", "10000"))
+
+
+def _to_int(value, field: str) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"{field} must be an integer.")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer.")
+
+
+def parse_chunk_number(value) -> int:
+    """
+    Validates a client-supplied chunk number. Raises ValueError unless it is an integer
+    in 1..MAX_CHUNKS_PER_SESSION.
+    """
+    chunk_number = _to_int(value, "chunkNumber")
+    if not 1 <= chunk_number <= MAX_CHUNKS_PER_SESSION:
+        raise ValueError(f"chunkNumber must be between 1 and {MAX_CHUNKS_PER_SESSION}.")
+    return chunk_number
+
+
+def _to_bool(value) -> bool:
+    return value in (True, 1, "true", "True", "1")
+
+
+def build_chunk_rows(payload: dict):
+    """
+    Validates one chunk descriptor and returns the (audio_chunk, chunk_upload_notification)
+    row dicts for it. Raises ValueError if required fields are missing or malformed.
+    """
     session_id = payload.get("sessionId")
     gcs_path = payload.get("gcsPath")
     chunk_number = payload.get("chunkNumber")
@@ -27,32 +65,298 @@ async def notify_chunk_uploaded(
         session_id, gcs_path, chunk_number is not None, is_last is not None,
         total_chunks_client is not None, public_url, mime_type, selected_template_id, model
     ]):
-        raise HTTPException(status_code=400, detail="Missing required fields.")
+        raise ValueError("Missing required fields.")
 
-    async with AsyncSessionLocal() as session:
-        # Insert into audio_chunk table
-        audio_chunk = AudioChunk(
-            id=uuid.uuid4(),
-            session_id=session_id,
-            chunk_number=chunk_number,
-            gcs_path=gcs_path,
-            public_url=public_url,
-            mime_type=mime_type
+    try:
+        session_id = uuid.UUID(str(session_id))
+    except ValueError:
+        raise ValueError("sessionId must be a UUID.")
+    chunk_number = parse_chunk_number(chunk_number)
+    total_chunks_client = _to_int(total_chunks_client, "totalChunksClient")
+    if not 0 <= total_chunks_client <= MAX_CHUNKS_PER_SESSION:
+        raise ValueError(f"totalChunksClient must be between 0 and {MAX_CHUNKS_PER_SESSION}.")
+
+    audio_chunk = {
+        "id": uuid.uuid4(),
+        "session_id": session_id,
+        "chunk_number": chunk_number,
+        "gcs_path": gcs_path,
+        "public_url": public_url,
+        "mime_type": mime_type
+    }
+    notification = {
+        "id": uuid.uuid4(),
+        "session_id": session_id,
+        "chunk_number": chunk_number,
+        "total_chunks_client": total_chunks_client,
+        "is_last": _to_bool(is_last),
+        "selected_template_id": selected_template_id,
+        "model": model
+    }
+    return audio_chunk, notification
+
+
+def is_last_chunk(notification: dict) -> bool:
+    return notification["is_last"] is True
+
+
+def mark_received(bitmap: bytes, chunk_numbers) -> bytes:
+    """
+    Returns `bitmap` with the bits for the given (1-based) chunk numbers set.
+    """
+    bits = bytearray(bitmap)
+    for n in chunk_numbers:
+        index, bit = divmod(n - 1, 8)
+        if index >= len(bits):
+            bits.extend(b"\0" * (index + 1 - len(bits)))
+        bits[index] |= 1 << bit
+    return bytes(bits)
+
+
+def count_received(bitmap: bytes) -> int:
+    return sum(bin(b).count("1") for b in bitmap)
+
+
+def missing_chunks(bitmap: bytes, total: int) -> List[int]:
+    """
+    Chunk numbers in 1..total whose bit is not set.
+    """
+    missing = []
+    for n in range(1, total + 1):
+        index, bit = divmod(n - 1, 8)
+        if index >= len(bitmap) or not bitmap[index] & (1 << bit):
+            missing.append(n)
+    return missing
+
+
+def highest_received(bitmap: bytes) -> int:
+    for index in range(len(bitmap) - 1, -1, -1):
+        if bitmap[index]:
+            return index * 8 + bitmap[index].bit_length()
+    return 0
+
+
+def expected_total(ledger_total, notifications) -> int:
+    """
+    Chunk count for a session: the largest totalChunksClient reported, or the last chunk's number.
+    """
+    total = ledger_total or 0
+    for n in notifications:
+        total = max(total, n["total_chunks_client"] or 0)
+        if n["is_last"]:
+            total = max(total, n["chunk_number"])
+    return total or None
+
+
+async def update_ledger(session, session_id, notifications):
+    """
+    Applies newly recorded notifications to the session's ledger row, locking it for the
+    rest of the transaction. A session without a row (one that predates the ledger) is
+    seeded from its existing notifications.
+    """
+    query = select(SessionChunkLedger).where(SessionChunkLedger.session_id == session_id).with_for_update()
+    ledger = (await session.execute(query)).scalar_one_or_none()
+    if ledger is None:
+        created = await session.execute(
+            insert(SessionChunkLedger)
+            .values(session_id=session_id, received_count=0, received_bitmap=b"")
+            .on_conflict_do_nothing()
+            .returning(SessionChunkLedger.session_id)
         )
-        session.add(audio_chunk)
-
-        # Insert into chunk_upload_notification table
-        notification = ChunkUploadNotification(
-            id=uuid.uuid4(),
-            session_id=session_id,
-            chunk_number=chunk_number,
-            total_chunks_client=total_chunks_client,
-            is_last=is_last,
-            selected_template_id=selected_template_id,
-            model=model
+        if created.first() is not None:
+            # Includes the rows inserted by this transaction
+            rows = await session.execute(
+                select(ChunkUploadNotification.chunk_number, ChunkUploadNotification.total_chunks_client,
+                       ChunkUploadNotification.is_last)
+                .where(ChunkUploadNotification.session_id == session_id)
+            )
+            notifications = [
+                {"chunk_number": number, "total_chunks_client": total, "is_last": is_last}
+                for number, total, is_last in rows
+            ]
+        ledger = (await session.execute(query)).scalar_one()
+
+    bitmap = mark_received(ledger.received_bitmap or b"", [n["chunk_number"] for n in notifications])
+    ledger.received_bitmap = bitmap
+    ledger.received_count = count_received(bitmap)
+    ledger.total_chunks = expected_total(ledger.total_chunks, notifications)
+
+
+async def record_chunks(session, doctor_id, audio_rows, notification_rows) -> set:
+    """
+    Inserts chunk rows, skipping (session_id, chunk_number) pairs that were already
+    recorded, updates each session's ledger, queues processing when a last chunk
+    arrives and acknowledges every chunk to the doctor's clients. Returns the
+    (session_id, chunk_number) pairs that were new.
+    """
+    await session.execute(
+        insert(AudioChunk).values(audio_rows)
+        .on_conflict_do_nothing(index_elements=["session_id", "chunk_number"])
+    )
+    result = await session.execute(
+        insert(ChunkUploadNotification).values(notification_rows)
+        .on_conflict_do_nothing(index_elements=["session_id", "chunk_number"])
+        .returning(ChunkUploadNotification.session_id, ChunkUploadNotification.chunk_number)
+    )
+    inserted = set(result.all())
+
+    by_session = {}
+    for notification in notification_rows:
+        by_session.setdefault(notification["session_id"], []).append(notification)
+    # Lock ledgers in a fixed order so concurrent batches cannot deadlock
+    for session_id in sorted(by_session, key=str):
+        notifications = by_session[session_id]
+        new = [n for n in notifications if (session_id, n["chunk_number"]) in inserted]
+        if new:
+            await update_ledger(session, session_id, new)
+        last = next((n for n in new if is_last_chunk(n)), None)
+        if last is not None:
+            # Queue post-upload processing in the same transaction as the last chunk;
+            # a retried last chunk must not reset a finished transcript to pending
+            await enqueue_processing_job(session, session_id, last["model"])
+        await publish(session, doctor_id, "chunk_ack", {
+            "sessionId": session_id,
+            "chunkNumbers": sorted({n["chunk_number"] for n in notifications}),
+            "isLast": any(is_last_chunk(n) for n in notifications),
+        })
+    return inserted
+
+
+async def owned_session_ids(session, doctor_id, session_ids) -> set:
+    """
+    The subset of session_ids that exist and belong to doctor_id.
+    """
+    result = await session.execute(
+        select(Session.id).where(Session.id.in_(session_ids), Session.doctor_id == doctor_id)
+    )
+    return set(result.scalars())
+
+
+@router.post("/notify-chunk-uploaded")
+async def notify_chunk_uploaded(
+    payload: dict = Body(...),
+    token: str = Depends(get_current_doctor)
+):
+    """
+    Records one uploaded chunk. Retrying a notification that was already recorded is a no-op.
+    """
+    try:
+        audio_chunk, notification = build_chunk_rows(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            if not await owned_session_ids(session, token, [notification["session_id"]]):
+                raise HTTPException(status_code=404, detail="Session not found")
+            inserted = await record_chunks(session, token, [audio_chunk], [notification])
+    return {"duplicate": not inserted}
+
+
+@router.post("/notify-chunks-uploaded")
+async def notify_chunks_uploaded(
+    chunks: List[dict] = Body(...),
+    token: str = Depends(get_current_doctor)
+):
+    """
+    Records a batch of uploaded chunks in one transaction, with one multi-row INSERT per table.
+    Each descriptor has the same shape as the /notify-chunk-uploaded body. Invalid descriptors
+    are reported individually and do not prevent the valid ones from being stored, as are
+    chunks of sessions that do not exist or belong to another doctor; chunks that were
+    already recorded are reported as "duplicate".
+    """
+    if not chunks:
+        raise HTTPException(status_code=400, detail="No chunks provided.")
+    if len(chunks) > MAX_CHUNKS_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_CHUNKS_PER_BATCH} chunks per request.")
+
+    results = []
+    keys = []  # (session_id, chunk_number) per result, None for invalid descriptors
+    audio_rows = []
+    notification_rows = []
+    for payload in chunks:
+        chunk_number = payload.get("chunkNumber") if isinstance(payload, dict) else None
+        try:
+            if not isinstance(payload, dict):
+                raise ValueError("Chunk descriptor must be an object.")
+            audio_chunk, notification = build_chunk_rows(payload)
+        except ValueError as e:
+            results.append({"chunkNumber": chunk_number, "status": "error", "detail": str(e)})
+            keys.append(None)
+            continue
+        audio_rows.append(audio_chunk)
+        notification_rows.append(notification)
+        results.append({"chunkNumber": notification["chunk_number"], "status": "ok"})
+        keys.append((notification["session_id"], notification["chunk_number"]))
+
+    inserted = set()
+    if audio_rows:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                # Checked up front so one foreign or unknown session cannot fail the whole batch
+                owned = await owned_session_ids(session, token, {n["session_id"] for n in notification_rows})
+                for i, key in enumerate(keys):
+                    if key is not None and key[0] not in owned:
+                        results[i].update(status="error", detail="Session not found")
+                        keys[i] = None
+                audio_rows = [r for r in audio_rows if r["session_id"] in owned]
+                notification_rows = [n for n in notification_rows if n["session_id"] in owned]
+                if notification_rows:
+                    inserted = await record_chunks(session, token, audio_rows, notification_rows)
+
+    # Only the first descriptor for a chunk that was not recorded before counts as new
+    seen = set()
+    for result, key in zip(results, keys):
+        if key is None:
+            continue
+        if key not in inserted or key in seen:
+            result["status"] = "duplicate"
+        seen.add(key)
+    return {"results": results}
+
+
+# GET /v1/sessions/{session_id}/missing-chunks
+@router.get("/sessions/{session_id}/missing-chunks", response_model=MissingChunksResponse)
+async def get_missing_chunks(
+    session_id: uuid.UUID,
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Chunk numbers (1-based) the server has not been notified about, read from the session's
+    ledger row. Until the total is known, gaps are reported up to the highest chunk received.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(
+            select(Session.id, SessionChunkLedger.total_chunks, SessionChunkLedger.received_bitmap)
+            .outerjoin(SessionChunkLedger, SessionChunkLedger.session_id == Session.id)
+            .where(Session.id == session_id, Session.doctor_id == doctor_id)
         )
-        session.add(notification)
+        row = result.first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Session not found")
+        _, total, bitmap = row
+        if bitmap is None:
+            # No ledger row yet: either nothing was uploaded or the session predates the ledger
+            rows = await session.execute(
+                select(ChunkUploadNotification.chunk_number, ChunkUploadNotification.total_chunks_client,
+                       ChunkUploadNotification.is_last)
+                .where(ChunkUploadNotification.session_id == session_id)
+            )
+            notifications = [
+                {"chunk_number": number, "total_chunks_client": count, "is_last": is_last}
+                for number, count, is_last in rows
+            ]
+            bitmap = mark_received(b"", [n["chunk_number"] for n in notifications])
+            total = expected_total(None, notifications)
 
-        await session.commit()
-    # Trigger processing pipeline here if needed (async task, etc.)
-    return {}
+    highest = highest_received(bitmap)
+    missing = missing_chunks(bitmap, max(total or 0, highest))
+    received = count_received(bitmap)
+    return {
+        "sessionId": session_id,
+        "totalChunks": total,
+        "receivedCount": received,
+        "highestChunk": highest,
+        "missing": missing,
+        "complete": total is not None and received >= total and not missing,
+    }
@@ -1,18 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from routers.utils import get_current_doctor
-from supabase import create_client
+from fastapi import APIRouter, HTTPException, Depends, Body, Request
+from fastapi.responses import FileResponse
+from routers.utils import get_current_doctor, get_current_doctor_for_stream, require_session_owner
+from routers.audio import parse_chunk_number
+from storage import get_storage, chunk_path, is_valid_path, path_session_id, LocalStorage
+import asyncio
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 router = APIRouter(prefix="/v1", tags=["cloud"])
 
-# Init Supabase client
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-BUCKET_NAME = os.getenv("SUPABASE_BUCKET", "medinote-audio")
+# Upper bounds for /get-presigned-urls: chunks per request and concurrent signing calls
+MAX_PRESIGNED_URLS_PER_BATCH = 200
+PRESIGN_CONCURRENCY = int(os.getenv("PRESIGN_CONCURRENCY", "8"))
+
+# Largest body accepted by the server-side upload path
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+
+async def sign_upload(path: str) -> dict:
+    """
+    Generates a signed upload URL through the storage backend, which keeps blocking
+    client calls off the event loop.
+    """
+    storage = get_storage()
+    return {
+        "url": await storage.create_signed_upload_url(path),
+        "supabasePath": path,
+        "publicUrl": storage.public_url(path)
+    }
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
 @router.post("/get-presigned-url")
 async def get_presigned_url(
@@ -25,24 +42,119 @@ async def get_presigned_url(
 
     if not all([session_id, chunk_number, mime_type]):
         raise HTTPException(status_code=400, detail="Missing required fields.")
-
-    ext = mime_type.split("/")[-1]
-    supabase_path = f"sessions/{session_id}/chunk_{chunk_number}.{ext}"
+    try:
+        chunk_number = parse_chunk_number(chunk_number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    session_id = await require_session_owner(session_id, token)
+    if not is_valid_path(chunk_path(session_id, chunk_number, mime_type)):
+        raise HTTPException(status_code=400, detail="Invalid mimeType.")
 
     try:
         # Generate signed upload URL (valid 15 minutes)
-        signed_url_data = supabase.storage.from_(BUCKET_NAME).create_signed_upload_url(
-            supabase_path
+        return await sign_upload(chunk_path(session_id, chunk_number, mime_type))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/get-presigned-urls")
+async def get_presigned_urls(
+    payload: dict = Body(...),
+    token: str = Depends(get_current_doctor)
+):
+    """
+    Signs upload URLs for several chunks of one session at once.
+    Body: {"sessionId", "mimeType", "chunkNumbers": [...]}. Chunk numbers that are not
+    integers in 1..MAX_CHUNKS_PER_SESSION, or repeat an earlier one, get an error entry.
+    """
+    session_id = payload.get("sessionId")
+    chunk_numbers = payload.get("chunkNumbers")
+    mime_type = payload.get("mimeType")
+
+    if not all([session_id, chunk_numbers, mime_type]) or not isinstance(chunk_numbers, list):
+        raise HTTPException(status_code=400, detail="Missing required fields.")
+    if len(chunk_numbers) > MAX_PRESIGNED_URLS_PER_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_PRESIGNED_URLS_PER_BATCH} chunks per request."
         )
+    session_id = await require_session_owner(session_id, token)
+    if not is_valid_path(chunk_path(session_id, 1, mime_type)):
+        raise HTTPException(status_code=400, detail="Invalid mimeType.")
 
-        if not signed_url_data:
-            raise Exception("Could not generate signed URL")
+    semaphore = asyncio.Semaphore(PRESIGN_CONCURRENCY)
+    seen = set()
 
-        return {
-            "url": signed_url_data["signedUrl"],
-            "supabasePath": supabase_path,
-            "publicUrl": supabase.storage.from_(BUCKET_NAME).get_public_url(supabase_path)
-        }
+    async def sign_chunk(value):
+        try:
+            chunk_number = parse_chunk_number(value)
+        except ValueError as e:
+            # Echo only scalars back; the item may be any JSON value
+            return {"chunkNumber": value if isinstance(value, (int, str)) else None, "error": str(e)}
+        if chunk_number in seen:
+            return {"chunkNumber": chunk_number, "error": "Duplicate chunkNumber."}
+        seen.add(chunk_number)
+        async with semaphore:
+            try:
+                signed = await sign_upload(chunk_path(session_id, chunk_number, mime_type))
+                return {"chunkNumber": chunk_number, **signed}
+            except Exception as e:
+                return {"chunkNumber": chunk_number, "error": str(e)}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    urls = await asyncio.gather(*(sign_chunk(n) for n in chunk_numbers))
+    return {"urls": urls}
+
+
+@router.put("/upload/{path:path}")
+async def upload_object(
+    path: str,
+    request: Request,
+    token: str = Depends(get_current_doctor)
+):
+    """
+    Server-side upload path: streams the request body straight into storage without
+    buffering it in memory. `path` is the supabasePath returned by /get-presigned-url.
+    """
+    if not is_valid_path(path):
+        raise HTTPException(status_code=400, detail="Invalid object path.")
+    await require_session_owner(path_session_id(path), token)
+    content_length = request.headers.get("content-length")
+    if content_length:
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header.")
+        if content_length > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Upload too large.")
+
+    async def body():
+        received = 0
+        async for block in request.stream():
+            received += len(block)
+            if received > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Upload too large.")
+            if block:
+                yield block
+
+    storage = get_storage()
+    size = await storage.write_stream(path, body(), request.headers.get("content-type"))
+    return {"supabasePath": path, "publicUrl": storage.public_url(path), "size": size}
+
+
+@router.get("/storage/{path:path}")
+async def get_local_object(
+    path: str,
+    doctor_id: str = Depends(get_current_doctor_for_stream)
+):
+    """
+    Serves objects for the local storage backend to the doctor who owns the session.
+    The token may be passed as `access_token` so <audio> elements can load the URL.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage) or not is_valid_path(path):
+        raise HTTPException(status_code=404, detail="Not found")
+    await require_session_owner(path_session_id(path), doctor_id)
+    full = storage.local_path(path)
+    if not os.path.isfile(full):
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(full)
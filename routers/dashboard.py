@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.future import select
+from database import AsyncReadSessionLocal
+from models import DoctorDashboard, DoctorPatientSummary, Patient
+from routers.utils import get_current_doctor
+from schemas import DashboardResponse
+
+router = APIRouter(prefix="/v1", tags=["dashboard"])
+
+
+# GET /dashboard
+@router.get("/dashboard", response_model=DashboardResponse)
+async def get_dashboard(
+    limit: int = Query(20, ge=1, le=100),
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Session counts by status, patient count and the most recently seen patients,
+    read from the summary tables kept up to date by dashboard.py. Two indexed lookups,
+    however much history the doctor has.
+    """
+    async with AsyncReadSessionLocal() as session:
+        totals = (await session.execute(
+            select(DoctorDashboard).where(DoctorDashboard.doctor_id == doctor_id)
+        )).scalar_one_or_none()
+        patients = (await session.execute(
+            select(DoctorPatientSummary, Patient.name)
+            .join(Patient, Patient.id == DoctorPatientSummary.patient_id)
+            .where(DoctorPatientSummary.doctor_id == doctor_id)
+            .order_by(DoctorPatientSummary.last_session_at.desc().nulls_last())
+            .limit(limit)
+        )).all()
+
+    if totals is None:
+        totals = DoctorDashboard(
+            session_count=0, recording_count=0, completed_count=0, failed_count=0,
+            patient_count=0,
+        )
+    return {
+        "sessionCount": totals.session_count,
+        "statusCounts": {
+            "recording": totals.recording_count,
+            "completed": totals.completed_count,
+            "failed": totals.failed_count,
+        },
+        "patientCount": totals.patient_count,
+        "lastSessionAt": totals.last_session_at,
+        "recentPatients": [
+            {
+                "patientId": summary.patient_id,
+                "name": name,
+                "sessionCount": summary.session_count,
+                "lastSessionId": summary.last_session_id,
+                "lastSessionAt": summary.last_session_at,
+            }
+            for summary, name in patients
+        ],
+    }
@@ -1,58 +1,118 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from models import Doctor
-from schemas import DoctorSignup, DoctorLogin
+from schemas import DoctorSignup, DoctorLogin, DoctorTokenResponse, RefreshRequest
 from database import AsyncSessionLocal
-from auth import get_password_hash, verify_password, create_access_token, create_refresh_token
+from sqlalchemy import update
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from jose import JWTError, jwt
+from auth import (
+    get_password_hash_async, verify_and_update_password_async, create_token_pair, token_id,
+    token_denylist, revoke, revoke_family, SECRET_KEY, ALGORITHM
+)
 
 router = APIRouter(prefix="/auth", tags=["doctor"])
 
-@router.post("/signup")
+@router.post("/signup", response_model=DoctorTokenResponse)
 async def doctor_signup(payload: DoctorSignup):
+    hashed_pw = await get_password_hash_async(payload.password)
     async with AsyncSessionLocal() as session:
+        # One statement: the unique email turns a duplicate into "no row returned"
         result = await session.execute(
-            Doctor.__table__.select().where(Doctor.email == payload.email)
+            insert(Doctor)
+            .values(
+                name=payload.name,
+                email=payload.email,
+                specialization=payload.specialization,
+                password_hash=hashed_pw,
+            )
+            .on_conflict_do_nothing(index_elements=[Doctor.email])
+            .returning(Doctor.id)
         )
-        if result.scalar():
+        doctor_id = result.scalar()
+        if doctor_id is None:
             raise HTTPException(status_code=400, detail="Email already registered")
-        hashed_pw = get_password_hash(payload.password)
-        doctor = Doctor(
-            name=payload.name,
-            email=payload.email,
-            specialization=payload.specialization,
-            password_hash=hashed_pw,
-        )
-        session.add(doctor)
         await session.commit()
-        await session.refresh(doctor)
-        token_data = {"sub": doctor.email, "doctor_id": str(doctor.id)}
-        access_token = create_access_token(token_data)
-        refresh_token = create_refresh_token(token_data)
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer",
-            "doctor_id": str(doctor.id)
-        }
+    access_token, refresh_token, _ = create_token_pair(payload.email, doctor_id)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "doctor_id": str(doctor_id)
+    }
 
-@router.post("/login")
+@router.post("/login", response_model=DoctorTokenResponse)
 async def doctor_login(payload: DoctorLogin):
+    # The connection goes back to the pool before hashing: waiting for a hash thread
+    # while holding it would let a login storm drain the pool
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            Doctor.__table__.select().where(Doctor.email == payload.email)
+            select(Doctor.id, Doctor.email, Doctor.password_hash).where(Doctor.email == payload.email)
         )
-        doctor_row = result.first()
-        if not doctor_row:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        doctor = Doctor(**doctor_row._mapping)
-        if not verify_password(payload.password, doctor.password_hash):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        token_data = {"sub": doctor.email, "doctor_id": str(doctor.id)}
-        access_token = create_access_token(token_data)
-        refresh_token = create_refresh_token(token_data)
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer",
-            "doctor_id": str(doctor.id)
-        }
+        doctor = result.first()
+    if not doctor:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await verify_and_update_password_async(payload.password, doctor.password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash used outdated parameters; upgrade it transparently
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(Doctor).where(Doctor.id == doctor.id).values(password_hash=new_hash))
+            await session.commit()
+    access_token, refresh_token, _ = create_token_pair(doctor.email, doctor.id)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "doctor_id": str(doctor.id)
+    }
+
+invalid_refresh_token = HTTPException(status_code=401, detail="Invalid refresh token")
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid_refresh_token
+    if claims.get("type") != "refresh" or not claims.get("doctor_id"):
+        raise invalid_refresh_token
+    return claims
+
+@router.post("/refresh", response_model=DoctorTokenResponse)
+async def refresh_tokens(payload: RefreshRequest):
+    """
+    Exchanges a refresh token for a new access/refresh pair without reading the
+    database or hashing a password. The presented token is rotated out; presenting it
+    again revokes every token descended from the same login. Revocations are broadcast
+    to the other workers with one NOTIFY.
+    """
+    claims = decode_refresh_token(payload.refresh_token)
+    jti = token_id(payload.refresh_token, claims)
+    # Tokens issued before rotation existed have no family; theirs starts with this refresh
+    family = claims.get("fam")
+    if family in token_denylist:
+        raise invalid_refresh_token
+    if jti in token_denylist:
+        # An already-rotated token came back, so it may have leaked: end the whole family
+        if family:
+            await revoke_family(family)
+        raise invalid_refresh_token
+    await revoke(jti, claims["exp"])
+    access_token, refresh_token, _ = create_token_pair(claims.get("sub"), claims["doctor_id"], family)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "doctor_id": claims["doctor_id"]
+    }
+
+@router.post("/logout")
+async def logout(payload: RefreshRequest):
+    """
+    Revokes the refresh token's family, including access tokens issued with it.
+    """
+    claims = decode_refresh_token(payload.refresh_token)
+    await revoke_family(claims.get("fam") or token_id(payload.refresh_token, claims))
+    return {}
@@ -0,0 +1,188 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+import zlib
+import orjson
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, tuple_
+from sqlalchemy.future import select
+from database import AsyncReadSessionLocal
+from models import Patient, Session, Template
+from routers.utils import get_current_doctor
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1", tags=["export"])
+
+# Rows fetched per batch, each in its own short transaction; bounds memory per export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+# Exports running at once; the rest wait, so downloads cannot drain the read pool
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "2"))
+# Upper bound on each batch query
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "30000"))
+
+export_semaphore = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+EXPORT_COLUMNS = {
+    "session_id": Session.id,
+    "session_title": Session.session_title,
+    "status": Session.status,
+    "transcript_status": Session.transcript_status,
+    "date": Session.date,
+    "start_time": Session.start_time,
+    "end_time": Session.end_time,
+    "duration": Session.duration,
+    "patient_id": Patient.id,
+    "patient_name": Patient.name,
+    "patient_email": Patient.email,
+    "template_id": Template.id,
+    "template_title": Template.title,
+    "template_type": Template.type,
+    "session_summary": Session.session_summary,
+    "transcript": Session.transcript,
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+# Leading characters that make spreadsheets treat a cell as a formula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_query(doctor_id, fields, after=None, null_start=False):
+    """
+    One batch of the doctor's sessions, newest start_time first and sessions without one
+    last. `after` is the (start_time, id) or id of the previous batch's last row. The
+    ordering walks ix_session_doctor_start_id (start_time DESC NULLS LAST, id DESC), so
+    each batch reads only its own rows, as in get_all_sessions. The keys are selected
+    after `fields` for the next batch's cursor.
+    """
+    statement = (
+        select(
+            *(EXPORT_COLUMNS[f].label(f) for f in fields),
+            Session.start_time.label("after_start_time"), Session.id.label("after_id"),
+        )
+        .join(Patient, Patient.id == Session.patient_id)
+        .outerjoin(Template, Template.id == Session.template_id)
+        .where(Session.doctor_id == doctor_id)
+        .limit(EXPORT_BATCH_SIZE)
+    )
+    if null_start:
+        statement = statement.where(Session.start_time.is_(None)).order_by(Session.id.desc())
+        if after is not None:
+            statement = statement.where(Session.id < after)
+    else:
+        statement = (
+            statement.where(Session.start_time.isnot(None))
+            .order_by(Session.start_time.desc().nulls_last(), Session.id.desc())
+        )
+        if after is not None:
+            statement = statement.where(tuple_(Session.start_time, Session.id) < tuple_(*after))
+    return statement
+
+
+async def export_batches(doctor_id, fields):
+    """
+    Yields the doctor's sessions batch by batch. Each batch is one short transaction
+    under EXPORT_STATEMENT_TIMEOUT_MS, so no connection is held while the client reads.
+    """
+    for null_start in (False, True):
+        after = None
+        while True:
+            async with AsyncReadSessionLocal() as session:
+                async with session.begin():
+                    await session.execute(
+                        select(func.set_config("statement_timeout", str(EXPORT_STATEMENT_TIMEOUT_MS), True))
+                    )
+                    rows = (await session.execute(export_query(doctor_id, fields, after, null_start))).all()
+            if not rows:
+                break
+            yield [row[:len(fields)] for row in rows]
+            last = rows[-1]
+            after = last[-1] if null_start else tuple(last[-2:])
+            if len(rows) < EXPORT_BATCH_SIZE:
+                break
+
+
+def ndjson_encoder(fields):
+    def encode(rows) -> bytes:
+        return b"".join(orjson.dumps(dict(zip(fields, row)), default=str) + b"\n" for row in rows)
+
+    def error(message: str) -> bytes:
+        return orjson.dumps({"error": message}) + b"\n"
+
+    return None, encode, error
+
+
+def csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_encoder(fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(rows) -> bytes:
+        writer.writerows([csv_cell(v) for v in row] for row in rows)
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    def error(message: str) -> bytes:
+        return encode([["#error", message]])
+
+    return encode([fields]), encode, error
+
+
+# GET /export?format={ndjson|csv}&gzip={true|false}
+@router.get("/export")
+async def export_sessions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    includeTranscript: bool = False,
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Streams every session of the authenticated doctor, with its patient and template,
+    as NDJSON or CSV (optionally gzipped). Rows are fetched in keyset batches of
+    EXPORT_BATCH_SIZE and encoded and compressed batch by batch, so memory stays flat
+    however large the archive is. At most EXPORT_CONCURRENCY exports run at once. If a
+    batch fails, the file ends with an error record ({"error": ...} or a "#error" row)
+    rather than just stopping. Transcripts are included only when includeTranscript=true.
+    """
+    fields = [f for f in EXPORT_COLUMNS if includeTranscript or f != "transcript"]
+    header, encode, error = (csv_encoder if format == "csv" else ndjson_encoder)(fields)
+    # wbits=31 writes a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+
+    async def body():
+        if header:
+            yield compressor.compress(header) if compressor else header
+        async with export_semaphore:
+            try:
+                async for rows in export_batches(doctor_id, fields):
+                    data = encode(rows)
+                    if compressor:
+                        data = compressor.compress(data)
+                    if data:
+                        yield data
+            except Exception:
+                logger.exception("Export failed for doctor %s", doctor_id)
+                data = error("Export failed before completion; the file is incomplete.")
+                yield compressor.compress(data) if compressor else data
+        if compressor:
+            yield compressor.flush()
+
+    filename = f"medinote-export.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = "application/gzip" if gzip else MEDIA_TYPES[format]
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
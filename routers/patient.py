@@ -1,115 +1,269 @@
 from fastapi import Body
+import csv
+import json
+import os
+import tempfile
 import uuid
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import func, literal_column
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from models import Patient, Session, Template
-from schemas import PatientCreate
+from schemas import PatientCreate, PatientResponse, PatientCreatedResponse, PatientListResponse, PatientIdResponse
 from database import AsyncSessionLocal
-from routers.utils import get_current_doctor
+from routers.utils import get_current_doctor, cached_json_response, aiter_lines
+from cache import invalidate
 
 router = APIRouter(prefix="/v1", tags=["patient"])
 
-@router.post("/add-patient-ext")
+def patients_cache_key(doctor_id) -> str:
+    return f"patients:{doctor_id}"
+
+# Columns backing PatientResponse; list endpoints select only these
+PATIENT_RESPONSE_COLUMNS = (
+    Patient.id, Patient.doctor_id, Patient.name, Patient.email,
+    # TODO: Add these columns after running migration_add_dob_gender.sql
+    # Patient.date_of_birth, Patient.gender,
+    Patient.pronouns, Patient.background, Patient.medical_history,
+    Patient.family_history, Patient.social_history, Patient.previous_treatment,
+)
+
+# Rows per INSERT ... ON CONFLICT statement in /patients/import
+IMPORT_BATCH_SIZE = int(os.getenv("PATIENT_IMPORT_BATCH_SIZE", "500"))
+
+def patient_values(patient: PatientCreate) -> dict:
+    return {
+        "doctor_id": patient.doctor_id,
+        "name": patient.name,
+        "email": patient.email,
+        # TODO: Add these fields after running migration_add_dob_gender.sql
+        # "date_of_birth": patient.date_of_birth,
+        # "gender": patient.gender,
+        "pronouns": patient.pronouns,
+        "background": patient.background,
+        "medical_history": patient.medical_history,
+        "family_history": patient.family_history,
+        "social_history": patient.social_history,
+        "previous_treatment": patient.previous_treatment,
+    }
+
+@router.post("/add-patient-ext", response_model=PatientCreatedResponse)
 async def add_patient_ext(
     patient: PatientCreate,
     doctor_id: str = Depends(get_current_doctor)
 ):
+    if str(patient.doctor_id) != doctor_id:
+        raise HTTPException(status_code=403, detail="Doctor ID mismatch or unauthorized")
     async with AsyncSessionLocal() as session:
-        if str(patient.doctor_id) != doctor_id:
-            raise HTTPException(status_code=403, detail="Doctor ID mismatch or unauthorized")
+        # One statement: uix_doctor_email turns a duplicate into "no row returned"
         result = await session.execute(
-            Patient.__table__.select().where(Patient.doctor_id == patient.doctor_id, Patient.email == patient.email)
+            insert(Patient)
+            .values(patient_values(patient))
+            .on_conflict_do_nothing(index_elements=[Patient.doctor_id, Patient.email])
+            .returning(*PATIENT_RESPONSE_COLUMNS)
         )
-        if result.first():
+        row = result.first()
+        if not row:
             raise HTTPException(status_code=400, detail="Patient with this email already exists for this doctor.")
-        new_patient = Patient(
-            doctor_id=patient.doctor_id,
-            name=patient.name,
-            email=patient.email,
-            # TODO: Add these fields after running migration_add_dob_gender.sql
-            # date_of_birth=patient.date_of_birth,
-            # gender=patient.gender,
-            pronouns=patient.pronouns,
-            background=patient.background,
-            medical_history=patient.medical_history,
-            family_history=patient.family_history,
-            social_history=patient.social_history,
-            previous_treatment=patient.previous_treatment,
-        )
-        session.add(new_patient)
         await session.commit()
-        await session.refresh(new_patient)
-        return {"patient": {
-            "id": str(new_patient.id),
-            "name": new_patient.name,
-            "email": new_patient.email,
-            "doctor_id": str(new_patient.doctor_id),
-            # TODO: Add these fields after running migration_add_dob_gender.sql
-            # "date_of_birth": new_patient.date_of_birth.isoformat() if new_patient.date_of_birth else None,
-            # "gender": new_patient.gender,
-            "pronouns": new_patient.pronouns,
-            "background": new_patient.background,
-            "medical_history": new_patient.medical_history,
-            "family_history": new_patient.family_history,
-            "social_history": new_patient.social_history,
-            "previous_treatment": new_patient.previous_treatment
-        }}
-
-@router.get("/patients")
-async def get_patients_by_doctor(doctor_id: str, token_doctor_id: str = Depends(get_current_doctor)):
+    await invalidate(patients_cache_key(doctor_id))
+    return {"patient": row}
+
+@router.get("/patients", response_model=PatientListResponse)
+async def get_patients_by_doctor(request: Request, doctor_id: str, token_doctor_id: str = Depends(get_current_doctor)):
+    """
+    Returns the doctor's patient roster. Responses are cached per doctor and carry an
+    ETag; a matching If-None-Match gets 304 without touching the database.
+    """
     if doctor_id != token_doctor_id:
         raise HTTPException(status_code=403, detail="Doctor ID mismatch or unauthorized")
-    async with AsyncSessionLocal() as session:
-        from sqlalchemy.future import select
-        result = await session.execute(select(Patient).where(Patient.doctor_id == doctor_id))
-        patients = [
-            {
-                "id": str(patient.id),
-                "name": patient.name,
-                "email": patient.email,
-                "doctor_id": str(patient.doctor_id),
-                # TODO: Add these fields after running migration_add_dob_gender.sql
-                # "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
-                # "gender": patient.gender,
-                "pronouns": patient.pronouns,
-                "background": patient.background,
-                "medical_history": patient.medical_history,
-                "family_history": patient.family_history,
-                "social_history": patient.social_history,
-                "previous_treatment": patient.previous_treatment
-            }
-            for patient in result.scalars()
-        ]
-        return {"patients": patients}
-
-@router.get("/patient-id-by-email")
+
+    async def build():
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(*PATIENT_RESPONSE_COLUMNS).where(Patient.doctor_id == doctor_id))
+            patients = [PatientResponse.model_validate(row) for row in result.all()]
+            return PatientListResponse(patients=patients).model_dump()
+
+    return await cached_json_response(request, patients_cache_key(doctor_id), build)
+
+@router.get("/patient-id-by-email", response_model=PatientIdResponse)
 async def get_patient_id_by_email(email: str, doctor_id: str = Depends(get_current_doctor)):
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            Patient.__table__.select().where(Patient.email == email, Patient.doctor_id == doctor_id)
+            select(Patient.id).where(Patient.email == email, Patient.doctor_id == doctor_id)
         )
         row = result.first()
         if not row:
             raise HTTPException(status_code=404, detail="Patient not found")
-        return {"id": str(row.id)}
+        return {"id": row.id}
 
-@router.get("/patient-details/{patient_id}")
+@router.get("/patient-details/{patient_id}", response_model=PatientResponse)
 async def get_patient_details(patient_id: str, doctor_id: str = Depends(get_current_doctor)):
-    from sqlalchemy.future import select
+    # Primary, not replica: clients fetch a patient right after creating it
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Patient).where(Patient.id == patient_id, Patient.doctor_id == doctor_id))
-        patient = result.scalars().first()
-        if not patient:
+        result = await session.execute(
+            select(*PATIENT_RESPONSE_COLUMNS).where(Patient.id == patient_id, Patient.doctor_id == doctor_id)
+        )
+        row = result.first()
+        if not row:
             raise HTTPException(status_code=404, detail="Patient not found")
-        return {
-            "id": str(patient.id),
-            "name": patient.name,
-            "email": patient.email,
-            "doctor_id": str(patient.doctor_id),
-            "pronouns": patient.pronouns,
-            "background": patient.background,
-            "medical_history": patient.medical_history,
-            "family_history": patient.family_history,
-            "social_history": patient.social_history,
-            "previous_treatment": patient.previous_treatment
-        }
\ No newline at end of file
+        return row
+
+
+async def _import_records(request: Request, fmt: str):
+    """
+    Yields (row_number, record_dict_or_error) for each record of a CSV or NDJSON body.
+    CSV records may span lines when a quoted field contains a newline.
+    """
+    lines = aiter_lines(request.stream())
+    row = 0
+    if fmt == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                yield row, record
+            except ValueError as e:
+                yield row, e
+        return
+
+    header = None
+    pending = ""
+    async for line in lines:
+        pending = f"{pending}\n{line}" if pending else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        row += 1
+        yield row, {k: (v if v != "" else None) for k, v in zip(header, values)}
+    if pending:
+        row += 1
+        yield row, ValueError("Unterminated quoted field")
+
+
+# POST /patients/import?onConflict={skip|update}
+@router.post("/patients/import")
+async def import_patients(
+    request: Request,
+    onConflict: str = Query("skip", pattern="^(skip|update)$"),
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Bulk-imports patients from a streamed CSV (with header row) or NDJSON body, chosen by
+    Content-Type. Rows are validated against PatientCreate as they arrive and written in
+    batches with INSERT ... ON CONFLICT (doctor_id, email). Responds with an NDJSON report:
+    one line per row, then a summary line. The report is spooled to disk, so memory use
+    does not grow with the size of the upload.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        fmt = "csv"
+    elif "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+        fmt = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson.")
+
+    report = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+b")
+    counts = {"created": 0, "updated": 0, "skipped": 0, "error": 0}
+
+    def write(entry: dict):
+        report.write(json.dumps(entry).encode() + b"\n")
+        if "status" in entry:
+            counts[entry["status"]] += 1
+
+    patient_table = Patient.__table__
+    excluded_columns = ("name", "pronouns", "background", "medical_history",
+                        "family_history", "social_history", "previous_treatment")
+
+    async def upsert(session, rows: list) -> dict:
+        statement = insert(Patient).values(rows)
+        if onConflict == "update":
+            statement = statement.on_conflict_do_update(
+                index_elements=[patient_table.c.doctor_id, patient_table.c.email],
+                # onupdate does not apply to ON CONFLICT DO UPDATE; /v1/changes relies on updated_at
+                set_={**{c: statement.excluded[c] for c in excluded_columns}, "updated_at": func.now()},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(
+                index_elements=[patient_table.c.doctor_id, patient_table.c.email]
+            )
+        # xmax = 0 distinguishes freshly inserted rows from updated ones
+        result = await session.execute(
+            statement.returning(Patient.id, Patient.email, literal_column("xmax = 0").label("inserted"))
+        )
+        return {r.email: r for r in result.all()}
+
+    async def flush(session, batch: dict):
+        if not batch:
+            return
+        try:
+            written = await upsert(session, [values for _, values in batch.values()])
+            await session.commit()
+        except DBAPIError:
+            # One bad row fails the whole statement; retry row by row to report just that row
+            await session.rollback()
+            written = {}
+            for email, (row, values) in list(batch.items()):
+                try:
+                    written.update(await upsert(session, [values]))
+                    await session.commit()
+                except DBAPIError as e:
+                    await session.rollback()
+                    write({"row": row, "email": email, "status": "error", "detail": str(e.orig)})
+                    del batch[email]
+        for email, (row, _) in batch.items():
+            r = written.get(email)
+            if r is None:
+                write({"row": row, "email": email, "status": "skipped", "detail": "Patient with this email already exists."})
+            else:
+                write({"row": row, "email": email, "id": str(r.id), "status": "created" if r.inserted else "updated"})
+        batch.clear()
+
+    async with AsyncSessionLocal() as session:
+        batch = {}
+        async for row, record in _import_records(request, fmt):
+            if isinstance(record, Exception):
+                write({"row": row, "status": "error", "detail": str(record)})
+                continue
+            if record.get("doctor_id") not in (None, doctor_id):
+                write({"row": row, "status": "error", "detail": "Doctor ID mismatch or unauthorized"})
+                continue
+            try:
+                patient = PatientCreate(**{**record, "doctor_id": doctor_id})
+            except ValidationError as e:
+                write({"row": row, "status": "error", "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            # The same email twice in one statement is rejected by ON CONFLICT, so flush first
+            if patient.email in batch or len(batch) >= IMPORT_BATCH_SIZE:
+                await flush(session, batch)
+            batch[patient.email] = (row, patient_values(patient))
+        await flush(session, batch)
+
+    if counts["created"] or counts["updated"]:
+        await invalidate(patients_cache_key(doctor_id))
+    write({"summary": counts})
+    report.seek(0)
+
+    def report_lines():
+        try:
+            for line in report:
+                yield line
+        finally:
+            report.close()
+
+    return StreamingResponse(report_lines(), media_type="application/x-ndjson")
@@ -0,0 +1,103 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import false, func, literal, or_, union_all
+from sqlalchemy.future import select
+from database import AsyncReadSessionLocal
+from models import Patient, Session
+from routers.utils import get_current_doctor
+from schemas import SearchResponse
+
+router = APIRouter(prefix="/v1", tags=["search"])
+
+SEARCH_KINDS = ("all", "patients", "sessions")
+
+# Matches ranked per kind, most recently updated first. Ranking stops here so a common term
+# costs the same as a rare one; it also bounds how deep offset pagination can go.
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "1000"))
+
+
+# GET /search?q={q}&type={all|patients|sessions}&limit={limit}&offset={offset}
+@router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: str = Query("all", pattern="^(all|patients|sessions)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Full-text search over the authenticated doctor's patients (name, email, history fields)
+    and sessions (title, summary, transcript), ranked by ts_rank. Uses the GIN-indexed
+    search_vector columns and ranks at most SEARCH_CANDIDATES matches of each kind, the most
+    recently updated ones, so latency does not grow with how many rows a term matches.
+    `truncated` is true when some kind had more matches than that; older ones were not
+    ranked, and a narrower query would find them.
+    """
+    if offset + limit > SEARCH_CANDIDATES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Results are limited to the first {SEARCH_CANDIDATES}; refine the query."
+        )
+    query = func.websearch_to_tsquery("english", q)
+
+    def candidates(model, *columns):
+        # One row past the cap, only to tell whether anything was left out; CTEs so the
+        # ranking and the truncation check share one scan
+        ordering = (model.updated_at.desc(), model.id.desc())
+        return (
+            select(*columns, model.search_vector, func.row_number().over(order_by=ordering).label("position"))
+            .where(model.doctor_id == doctor_id, model.search_vector.op("@@")(query))
+            .order_by(*ordering)
+            .limit(SEARCH_CANDIDATES + 1)
+            .cte(f"{model.__tablename__}_candidates")
+        )
+
+    branches = []
+    pools = []
+    if type in ("all", "patients"):
+        patients = candidates(Patient, Patient.id, Patient.name, Patient.email)
+        pools.append(patients)
+        branches.append(
+            select(
+                literal("patient").label("kind"),
+                patients.c.id.label("id"),
+                patients.c.id.label("patient_id"),
+                patients.c.name.label("title"),
+                patients.c.email.label("subtitle"),
+                func.ts_rank(patients.c.search_vector, query).label("rank"),
+            ).where(patients.c.position <= SEARCH_CANDIDATES)
+        )
+    if type in ("all", "sessions"):
+        sessions = candidates(Session, Session.id, Session.patient_id, Session.session_title, Session.date)
+        pools.append(sessions)
+        branches.append(
+            select(
+                literal("session").label("kind"),
+                sessions.c.id.label("id"),
+                sessions.c.patient_id.label("patient_id"),
+                sessions.c.session_title.label("title"),
+                sessions.c.date.label("subtitle"),
+                func.ts_rank(sessions.c.search_vector, query).label("rank"),
+            ).where(sessions.c.position <= SEARCH_CANDIDATES)
+        )
+
+    truncated = or_(false(), *(
+        select(func.count()).select_from(pool).scalar_subquery() > SEARCH_CANDIDATES for pool in pools
+    ))
+    combined = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery()
+    statement = (
+        select(combined, truncated.label("truncated"))
+        .order_by(combined.c.rank.desc(), combined.c.id)
+        .limit(limit + 1)
+        .offset(offset)
+    )
+    async with AsyncReadSessionLocal() as session:
+        rows = (await session.execute(statement)).all()
+
+    # An empty page means no kind reached the cap, since offset + limit <= SEARCH_CANDIDATES
+    has_more = len(rows) > limit and offset + limit < SEARCH_CANDIDATES
+    return {
+        "results": [{k: v for k, v in row._mapping.items() if k != "truncated"} for row in rows[:limit]],
+        "nextOffset": offset + limit if has_more else None,
+        "truncated": bool(rows and rows[0].truncated),
+    }
@@ -1,9 +1,22 @@
 from sqlalchemy.future import select
-from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy import tuple_
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import AsyncSessionLocal
+from typing import Optional
+from database import AsyncSessionLocal, AsyncReadSessionLocal
 from models import Session, Patient, Template
-from utils import get_current_doctor
+from events import publish
+from dashboard import record_session_created
+from routers.utils import get_current_doctor, encode_cursor, decode_cursor, parse_range, cached_json_response, etag_matches
+from recordings import load_audio_parts, stream_parts
+import os
+from sqlalchemy.orm import undefer
+from schemas import (
+    PatientSessionListResponse, SessionPageResponse, SessionResponse,
+    TemplateResponse, TemplateListResponse, SessionCreatedResponse
+)
 import uuid
 
 
@@ -11,116 +24,151 @@ router = APIRouter(prefix="/session", tags=["Session"])
 
 
 # GET /fetch-session-by-patient/{patient_id}
-@router.get("/fetch-session-by-patient/{patient_id}")
+@router.get("/fetch-session-by-patient/{patient_id}", response_model=PatientSessionListResponse)
 async def fetch_sessions_by_patient(patient_id: str, doctor_id: str = Depends(get_current_doctor)):
     """
     Returns all sessions for a given patientId, only for the authenticated doctor.
     """
-    from sqlalchemy.future import select
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(Session).where(Session.patient_id == patient_id, Session.doctor_id == doctor_id)
+            select(Session.id, Session.date, Session.session_title, Session.session_summary, Session.duration)
+            .where(Session.patient_id == patient_id, Session.doctor_id == doctor_id)
         )
-        sessions = [
-            {
-                "id": str(s.id),
-                "date": s.date,
-                "session_title": s.session_title,
-                "session_summary": s.session_summary,
-                "duration": s.duration
-            }
-            for s in result.scalars()
-        ]
-        return {"sessions": sessions}
-
-
-# GET /all-session?userId={userId}
-
-@router.get("/all-session")
-async def get_all_sessions(userId: str, token_doctor_id: str = Depends(get_current_doctor)):
+        return {"sessions": result.all()}
+
+
+# GET /all-session?userId={userId}&limit={limit}&cursor={cursor}&fields={fields}
+
+# Session columns that may be requested through `fields=`, keyed by response name.
+SESSION_LIST_FIELDS = {
+    "id": Session.id,
+    "user_id": Session.doctor_id,
+    "patient_id": Session.patient_id,
+    "session_title": Session.session_title,
+    "session_summary": Session.session_summary,
+    "transcript_status": Session.transcript_status,
+    "transcript": Session.transcript,
+    "status": Session.status,
+    "date": Session.date,
+    "start_time": Session.start_time,
+    "end_time": Session.end_time,
+    "duration": Session.duration,
+}
+# Returned when `fields=` is omitted; transcripts are fetched from /session/{id}/transcript
+DEFAULT_SESSION_LIST_FIELDS = [f for f in SESSION_LIST_FIELDS if f != "transcript"]
+
+# Templates change rarely (global defaults almost never), so they are cached longer
+TEMPLATE_CACHE_TTL = float(os.getenv("TEMPLATE_CACHE_TTL", "3600"))
+
+# Tries at reading a transcript whose digest matches the ETag before giving up
+TRANSCRIPT_READ_ATTEMPTS = 3
+
+@router.get("/all-session", response_model=SessionPageResponse, response_model_exclude_unset=True)
+async def get_all_sessions(
+    userId: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    token_doctor_id: str = Depends(get_current_doctor)
+):
     """
-    Returns all sessions for a given doctor (userId), with patient details and patientMap.
+    Returns one page of sessions for a given doctor (userId), newest start_time first.
+    Pass the returned nextCursor back as `cursor` to fetch the following page, and a
+    comma-separated `fields` list (e.g. id,session_title,date,duration) to trim each row.
+    Patient details are returned once per patient in patientMap.
     """
     if userId != token_doctor_id:
         raise HTTPException(status_code=403, detail="Doctor ID mismatch or unauthorized")
-    from sqlalchemy.future import select
-    from sqlalchemy.orm import joinedload
-    async with AsyncSessionLocal() as session:
-        # Join Session and Patient
-        result = await session.execute(
-            select(Session, Patient)
-            .join(Patient, Session.patient_id == Patient.id)
-            .where(Session.doctor_id == userId)
-        )
-        sessions = []
+
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in SESSION_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        requested = list(DEFAULT_SESSION_LIST_FIELDS)
+    # id, patient_id and start_time are always needed for patientMap and the cursor.
+    selected = list(dict.fromkeys(["id", "patient_id", "start_time"] + requested))
+
+    base = select(*[SESSION_LIST_FIELDS[f].label(f) for f in selected]).where(Session.doctor_id == userId)
+    last_start = last_id = None
+    if cursor:
+        last_start, last_id = decode_cursor(cursor, 2)
+        try:
+            last_id = uuid.UUID(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    async with AsyncReadSessionLocal() as session:
+        # Two phases over ix_session_doctor_start_id (start_time DESC NULLS LAST, id DESC):
+        # sessions with a start_time via one row comparison, then the NULL tail by id
+        rows = []
+        if not (cursor and last_start is None):
+            query = base.where(Session.start_time.isnot(None))
+            if cursor:
+                query = query.where(tuple_(Session.start_time, Session.id) < tuple_(last_start, last_id))
+            query = query.order_by(Session.start_time.desc().nulls_last(), Session.id.desc()).limit(limit + 1)
+            rows = (await session.execute(query)).all()
+        if len(rows) <= limit:
+            query = base.where(Session.start_time.is_(None))
+            if cursor and last_start is None:
+                query = query.where(Session.id < last_id)
+            query = query.order_by(Session.id.desc()).limit(limit + 1 - len(rows))
+            rows += (await session.execute(query)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
         patient_map = {}
-        for s, p in result.all():
-            session_obj = {
-                "id": str(s.id),
-                "user_id": str(s.doctor_id),
-                "patient_id": str(p.id),
-                "session_title": s.session_title,
-                "session_summary": s.session_summary,
-                "transcript_status": s.transcript_status,
-                "transcript": s.transcript,
-                "status": s.status,
-                "date": s.date,
-                "start_time": s.start_time,
-                "end_time": s.end_time,
-                "patient_name": p.name,
-                "pronouns": p.pronouns,
-                "email": p.email,
-                # TODO: Add these fields after running migration_add_dob_gender.sql
-                # "gender": p.gender,
-                # "date_of_birth": p.date_of_birth.isoformat() if p.date_of_birth else None,
-                "background": p.background,
-                "duration": s.duration,
-                "medical_history": p.medical_history,
-                "family_history": p.family_history,
-                "social_history": p.social_history,
-                "previous_treatment": p.previous_treatment,
-                "patient_pronouns": p.pronouns,
-                "clinical_notes": []  # Placeholder for future notes
-            }
-            sessions.append(session_obj)
-            patient_map[str(p.id)] = {
-                "name": p.name,
-                "pronouns": p.pronouns,
-                # TODO: Add these fields after running migration_add_dob_gender.sql
-                # "gender": p.gender,
-                # "date_of_birth": p.date_of_birth.isoformat() if p.date_of_birth else None,
-                "email": p.email
-            }
-        return {"sessions": sessions, "patientMap": patient_map}
-    
+        patient_ids = {row.patient_id for row in rows}
+        if patient_ids:
+            result = await session.execute(
+                select(
+                    Patient.id, Patient.name, Patient.pronouns, Patient.email,
+                    Patient.background, Patient.medical_history, Patient.family_history,
+                    Patient.social_history, Patient.previous_treatment
+                ).where(Patient.id.in_(patient_ids), Patient.doctor_id == userId)
+            )
+            for p in result.all():
+                # TODO: Add gender and date_of_birth after running migration_add_dob_gender.sql
+                patient_map[str(p.id)] = p
+
+    # Dicts holding only the requested keys, so response_model_exclude_unset trims the rest
+    sessions = []
+    for row in rows:
+        mapping = row._mapping
+        item = {f: mapping[f] for f in requested}
+        item.setdefault("patient_id", row.patient_id)
+        sessions.append(item)
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+    return {"sessions": sessions, "patientMap": patient_map, "nextCursor": next_cursor}
+
 # GET /fetch-default-template-ext?userId={userId}
-@router.get("/fetch-default-template-ext")
-async def fetch_templates_by_user(userId: str, token_doctor_id: str = Depends(get_current_doctor)):
+@router.get("/fetch-default-template-ext", response_model=TemplateListResponse)
+async def fetch_templates_by_user(request: Request, userId: str, token_doctor_id: str = Depends(get_current_doctor)):
     """
     Returns all templates for a doctor (userId): both doctor-specific and global default templates.
+    Cached per doctor with ETag / If-None-Match support.
     """
     if userId != token_doctor_id:
         raise HTTPException(status_code=403, detail="Doctor ID mismatch or unauthorized")
-    from sqlalchemy.future import select
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Template).where(
-                (Template.doctor_id == userId) | (Template.type == 'default')
+
+    async def build():
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Template.id, Template.doctor_id, Template.title, Template.type).where(
+                    (Template.doctor_id == userId) | (Template.type == 'default')
+                )
             )
-        )
-        templates = [
-            {
-                "id": str(t.id),
-                "doctor_id": str(t.doctor_id) if t.doctor_id else None,
-                "title": t.title,
-                "type": t.type
-            }
-            for t in result.scalars()
-        ]
-        return {"templates": templates}
+            templates = [TemplateResponse.model_validate(row) for row in result.all()]
+            return TemplateListResponse(templates=templates).model_dump()
+
+    return await cached_json_response(request, f"templates:{userId}", build, ttl=TEMPLATE_CACHE_TTL)
     
 # POST /upload-session
-@router.post("/upload-session")
+@router.post("/upload-session", response_model=SessionCreatedResponse)
 async def upload_session(
     payload: dict = Body(...),
     token_doctor_id: str = Depends(get_current_doctor)
@@ -146,26 +194,125 @@ async def upload_session(
     if status not in ("recording", "completed", "failed"):
         raise HTTPException(status_code=400, detail="Invalid status value.")
 
-    # Create session
-
+    # Create session; the id is generated here, so nothing needs to be read back
+    session_id = uuid.uuid4()
     async with AsyncSessionLocal() as session:
-        new_session = Session(
-            id=uuid.uuid4(),
-            doctor_id=doctor_id,
-            patient_id=patient_id,
-            template_id=template_id,
-            status=status,
-            start_time=start_time,
-            # Optional fields
-            session_title=None,
-            session_summary=None,
-            transcript_status=None,
-            transcript=None,
-            date=None,
-            end_time=None,
-            duration=None
+        await session.execute(
+            insert(Session).values(
+                id=session_id,
+                doctor_id=doctor_id,
+                patient_id=patient_id,
+                template_id=template_id,
+                status=status,
+                start_time=start_time,
+            )
         )
-        session.add(new_session)
+        await record_session_created(session, session_id, doctor_id, patient_id, status, start_time)
+        await publish(session, doctor_id, "session_status", {"sessionId": str(session_id), "status": status})
         await session.commit()
-        await session.refresh(new_session)
-        return {"id": str(new_session.id)}
\ No newline at end of file
+    return {"id": session_id}
+
+
+# GET /{session_id}
+@router.get("/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: uuid.UUID, doctor_id: str = Depends(get_current_doctor)):
+    """
+    Returns one session of the authenticated doctor, summary and transcript included.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Session)
+            .options(undefer(Session.session_summary), undefer(Session.transcript))
+            .where(Session.id == session_id, Session.doctor_id == doctor_id)
+        )
+        found = result.scalar_one_or_none()
+    if found is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return found
+
+
+# GET /{session_id}/transcript
+@router.get("/{session_id}/transcript")
+async def get_session_transcript(
+    session_id: uuid.UUID,
+    request: Request,
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Returns a session transcript as UTF-8 text. Supports If-None-Match (ETag is the
+    transcript's md5) and single byte ranges. Only the requested bytes are read from the
+    database, in one query guarded by the ETag's digest, so the body always matches the
+    ETag and Content-Range sent with it.
+    """
+    async with AsyncReadSessionLocal() as session:
+        # A transcript rewritten between the two queries fails the digest guard; start over
+        for _ in range(TRANSCRIPT_READ_ATTEMPTS):
+            row = (await session.execute(
+                select(func.md5(Session.transcript), func.octet_length(Session.transcript))
+                .where(Session.id == session_id, Session.doctor_id == doctor_id)
+            )).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Session not found")
+            digest, size = row
+            if digest is None:
+                raise HTTPException(status_code=404, detail="Transcript not available")
+
+            etag = f'"{digest}"'
+            headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+            if etag_matches(request, etag):
+                return Response(status_code=304, headers=headers)
+
+            status_code = 200
+            start, end = 0, size - 1
+            byte_range = parse_range(request.headers.get("range"), size) if size else None
+            if byte_range:
+                start, end = byte_range
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            if not size:
+                return Response(content=b"", headers=headers, media_type="text/plain; charset=utf-8")
+
+            body = (await session.execute(
+                select(func.substring(func.convert_to(Session.transcript, "UTF8"), start + 1, end - start + 1))
+                .where(Session.id == session_id, func.md5(Session.transcript) == digest)
+            )).scalar()
+            if body is not None:
+                return Response(
+                    content=bytes(body), status_code=status_code, headers=headers, media_type="text/plain; charset=utf-8"
+                )
+    raise HTTPException(status_code=503, detail="Transcript is being updated; retry")
+
+
+@router.get("/{session_id}/audio")
+async def get_session_audio(
+    session_id: uuid.UUID,
+    request: Request,
+    doctor_id: str = Depends(get_current_doctor)
+):
+    """
+    Streams a session's recording as one continuous response: its chunks concatenated in
+    chunk_number order (or the merged object, once there is one). Single byte ranges are
+    mapped onto the chunks they cover, and storage is read one block at a time.
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            parts, media_type = await load_audio_parts(session, session_id, doctor_id)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Audio chunk missing from storage")
+    if parts is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    size = sum(p.size for p in parts)
+    if not size:
+        raise HTTPException(status_code=404, detail="Audio not available")
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+    status_code = 200
+    start, end = 0, size - 1
+    byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(stream_parts(parts, start, end), status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import os
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from events import get_event_hub
+from routers.utils import get_current_doctor_for_stream
+
+router = APIRouter(prefix="/v1", tags=["events"])
+
+# Comment lines keep idle connections open through proxies
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "25"))
+
+
+# GET /events
+@router.get("/events")
+async def stream_events(request: Request, doctor_id: str = Depends(get_current_doctor_for_stream)):
+    """
+    Server-Sent Events stream of the doctor's session status changes, transcript status
+    changes and chunk acknowledgements. Replaces polling all-session / fetch-session-by-patient.
+    A `resync` event means some events were dropped and state should be refetched.
+    """
+    hub = get_event_hub()
+    queue = hub.subscribe(doctor_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            hub.unsubscribe(doctor_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, or_
+from sqlalchemy.future import select
+import os
+from database import AsyncReadSessionLocal
+from models import Patient, Session, Template, DeletedRecord
+from routers.utils import get_current_doctor, encode_cursor, decode_cursor
+from routers.patient import PATIENT_RESPONSE_COLUMNS
+from schemas import ChangesResponse
+
+router = APIRouter(prefix="/v1", tags=["sync"])
+
+# updated_at is the writing transaction's start time, so a slow transaction can commit
+# rows older than a cursor already handed out. Re-send this window on every sync;
+# clients apply changes idempotently by id.
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "60"))
+
+SESSION_CHANGE_COLUMNS = (
+    Session.id, Session.doctor_id, Session.patient_id, Session.template_id,
+    Session.session_title, Session.session_summary, Session.transcript_status, Session.status,
+    Session.date, Session.start_time, Session.end_time, Session.duration, Session.updated_at,
+)
+
+
+# GET /changes?since={cursor}
+@router.get("/changes", response_model=ChangesResponse)
+async def get_changes(since: Optional[str] = None, doctor_id: str = Depends(get_current_doctor)):
+    """
+    Returns patients, sessions and templates created or changed since the cursor, plus
+    tombstones for deleted rows. Without `since` everything is returned (initial sync).
+    """
+    since_time = None
+    if since:
+        try:
+            since_time = datetime.fromisoformat(decode_cursor(since, 1)[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        since_time -= timedelta(seconds=SYNC_OVERLAP_SECONDS)
+
+    async with AsyncReadSessionLocal() as session:
+        # Taken before reading so nothing written during this sync is skipped next time
+        now = (await session.execute(select(func.now()))).scalar()
+
+        patient_query = select(*PATIENT_RESPONSE_COLUMNS, Patient.updated_at).where(Patient.doctor_id == doctor_id)
+        session_query = select(*SESSION_CHANGE_COLUMNS).where(Session.doctor_id == doctor_id)
+        template_query = select(
+            Template.id, Template.doctor_id, Template.title, Template.type, Template.updated_at
+        ).where((Template.doctor_id == doctor_id) | (Template.type == 'default'))
+        deleted = []
+        if since_time is not None:
+            patient_query = patient_query.where(Patient.updated_at > since_time)
+            session_query = session_query.where(Session.updated_at > since_time)
+            template_query = template_query.where(Template.updated_at > since_time)
+            result = await session.execute(
+                select(DeletedRecord.table_name, DeletedRecord.record_id, DeletedRecord.deleted_at).where(
+                    or_(
+                        DeletedRecord.doctor_id == doctor_id,
+                        (DeletedRecord.doctor_id.is_(None)) & (DeletedRecord.table_name == "template"),
+                    ),
+                    DeletedRecord.deleted_at > since_time,
+                )
+            )
+            deleted = result.all()
+
+        patients = (await session.execute(patient_query)).all()
+        sessions = (await session.execute(session_query)).all()
+        templates = (await session.execute(template_query)).all()
+
+    return {
+        "patients": patients,
+        "sessions": sessions,
+        "templates": templates,
+        "deleted": deleted,
+        "cursor": encode_cursor(now.isoformat()),
+    }
@@ -1,22 +1,180 @@
 from fastapi import Depends, HTTPException
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
+from auth import SECRET_KEY, ALGORITHM, token_denylist
+from cache import LRUCache
+from typing import Optional
 import os
+import uuid
+from sqlalchemy.future import select
+from database import AsyncSessionLocal
+from models import Session
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
+# Verified bearer tokens -> (doctor_id, token family). Entries never outlive the token's own `exp`.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+token_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+credentials_exception = HTTPException(
+    status_code=401,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
 def get_current_doctor(token: str = Depends(oauth2_scheme)):
-    from auth import SECRET_KEY, ALGORITHM
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        doctor_id: str = payload.get("doctor_id")
-        if doctor_id is None:
+    cached = token_cache.get(token)
+    if cached is not None:
+        doctor_id, family = cached
+        # Logout revokes the family; the cache must not keep its access tokens alive
+        if family in token_denylist:
             raise credentials_exception
         return doctor_id
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise credentials_exception
+    doctor_id: str = payload.get("doctor_id")
+    # Refresh tokens are only accepted by /auth/refresh
+    if doctor_id is None or payload.get("type") == "refresh":
+        raise credentials_exception
+    family = payload.get("fam")
+    if family in token_denylist:
+        raise credentials_exception
+    token_cache.set(token, (doctor_id, family), expires_at=payload.get("exp"))
+    return doctor_id
+
+def get_current_doctor_for_stream(
+    access_token: Optional[str] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """
+    Like get_current_doctor, but also accepts the token as an `access_token` query
+    parameter, since browser EventSource cannot set an Authorization header.
+    """
+    token = token or access_token
+    if not token:
+        raise credentials_exception
+    return get_current_doctor(token)
+
+async def require_session_owner(session_id, doctor_id) -> uuid.UUID:
+    """
+    Returns session_id as a UUID, raising 400 if it is malformed and 404 unless the
+    session exists and belongs to the doctor.
+    """
+    try:
+        session_id = uuid.UUID(str(session_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid session ID.")
+    # Primary: clients sign and upload chunks moments after creating the session
+    async with AsyncSessionLocal() as session:
+        found = (await session.execute(
+            select(Session.id).where(Session.id == session_id, Session.doctor_id == doctor_id)
+        )).first()
+    if found is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session_id
+
+def encode_cursor(*values) -> str:
+    """
+    Encodes keyset pagination values into an opaque, URL-safe cursor string.
+    """
+    import base64, json
+    raw = json.dumps([str(v) if v is not None else None for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Decodes a cursor produced by encode_cursor, raising 400 if it is malformed.
+    """
+    import base64, json
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def parse_range(range_header: str, size: int):
+    """
+    Parses a single-range `Range: bytes=...` header against a resource of `size` bytes.
+    Returns an inclusive (start, end) tuple, or None when the header should be ignored.
+    Raises 416 for unsatisfiable ranges.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_s, _, end_s = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+            end = min(end, size - 1)
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+def etag_matches(request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+async def cached_json_response(request, key: str, build, ttl: float = None):
+    """
+    Serves a JSON body from the response cache, answering 304 when the client's
+    If-None-Match matches. On a miss, `await build()` produces the payload, which is
+    serialized once and stored with its ETag. `build` must read from the primary: writers
+    invalidate the key after committing, and a lagging replica would cache the old rows.
+    """
+    import hashlib
+    import orjson
+    from fastapi.responses import Response
+    from cache import get_response_cache
+
+    cache = get_response_cache()
+    cached = await cache.get(key)
+    if cached is None:
+        payload = await build()
+        body = orjson.dumps(payload)
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        await cache.set(key, etag, body, ttl)
+    else:
+        etag, body = cached
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def aiter_lines(stream, encoding: str = "utf-8"):
+    """
+    Yields decoded lines (without line endings) from an async iterator of byte blocks,
+    holding at most one partial line in memory.
+    """
+    import codecs
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    async for block in stream:
+        pending += decoder.decode(block)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
@@ -1,6 +1,6 @@
 import datetime
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Dict, List, Optional
 import uuid
 
 class DoctorSignup(BaseModel):
@@ -18,14 +18,21 @@ class TokenResponse(BaseModel):
     refresh_token: str
     token_type: str = "bearer"
 
+class DoctorTokenResponse(TokenResponse):
+    doctor_id: str
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class PatientCreate(BaseModel):
     doctor_id: uuid.UUID
-    name: str
-    email: EmailStr
+    # Lengths match the patient columns, so a bad row fails validation instead of its INSERT
+    name: str = Field(max_length=100)
+    email: EmailStr = Field(max_length=100)
     # TODO: Add these fields after running migration_add_dob_gender.sql
     # date_of_birth: Optional[datetime.date] = None
     # gender: str
-    pronouns: Optional[str] = None                 # Optional as per frontend
+    pronouns: Optional[str] = Field(None, max_length=20)  # Optional as per frontend
     background: Optional[str] = None
     medical_history: Optional[str] = None
     family_history: Optional[str] = None
@@ -33,12 +40,15 @@ class PatientCreate(BaseModel):
     previous_treatment: Optional[str] = None
 
 class PatientResponse(BaseModel):
-    id: str
-    doctor_id: str
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    doctor_id: uuid.UUID
     name: str
     email: str
+    # TODO: Populate these fields after running migration_add_dob_gender.sql
     date_of_birth: Optional[str] = None  # ISO date string
-    gender: str
+    gender: Optional[str] = None
     pronouns: Optional[str] = None
     background: Optional[str] = None
     medical_history: Optional[str] = None
@@ -66,10 +76,52 @@ class SessionUpdate(BaseModel):
     duration: Optional[str] = None
 
 class SessionResponse(BaseModel):
-    id: str
-    doctor_id: str
-    patient_id: str
-    template_id: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    doctor_id: uuid.UUID
+    patient_id: uuid.UUID
+    template_id: Optional[uuid.UUID] = None
+    session_title: Optional[str] = None
+    session_summary: Optional[str] = None
+    transcript_status: Optional[str] = None
+    transcript: Optional[str] = None
+    status: Optional[str] = None
+    date: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    duration: Optional[str] = None
+
+class PatientCreatedResponse(BaseModel):
+    patient: PatientResponse
+
+class PatientListResponse(BaseModel):
+    patients: List[PatientResponse]
+
+class PatientIdResponse(BaseModel):
+    id: uuid.UUID
+
+class PatientSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    pronouns: Optional[str] = None
+    email: Optional[str] = None
+    background: Optional[str] = None
+    medical_history: Optional[str] = None
+    family_history: Optional[str] = None
+    social_history: Optional[str] = None
+    previous_treatment: Optional[str] = None
+
+class SessionListItem(BaseModel):
+    """
+    Row of /session/all-session. Only the columns requested via `fields=` are set.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    id: Optional[uuid.UUID] = None
+    user_id: Optional[uuid.UUID] = None
+    patient_id: Optional[uuid.UUID] = None
     session_title: Optional[str] = None
     session_summary: Optional[str] = None
     transcript_status: Optional[str] = None
@@ -79,3 +131,109 @@ class SessionResponse(BaseModel):
     start_time: Optional[str] = None
     end_time: Optional[str] = None
     duration: Optional[str] = None
+
+class SessionPageResponse(BaseModel):
+    sessions: List[SessionListItem]
+    patientMap: Dict[str, PatientSummary]
+    nextCursor: Optional[str] = None
+
+class PatientSessionItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    date: Optional[str] = None
+    session_title: Optional[str] = None
+    session_summary: Optional[str] = None
+    duration: Optional[str] = None
+
+class PatientSessionListResponse(BaseModel):
+    sessions: List[PatientSessionItem]
+
+class TemplateResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    doctor_id: Optional[uuid.UUID] = None
+    title: str
+    type: str
+
+class TemplateListResponse(BaseModel):
+    templates: List[TemplateResponse]
+
+class SessionCreatedResponse(BaseModel):
+    id: uuid.UUID
+
+class SearchResult(BaseModel):
+    kind: str  # 'patient' or 'session'
+    id: uuid.UUID
+    patient_id: uuid.UUID
+    title: Optional[str] = None
+    subtitle: Optional[str] = None  # patient email or session date
+    rank: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    nextOffset: Optional[int] = None
+    truncated: bool = False  # more matches than SEARCH_CANDIDATES; only the newest were ranked
+
+class PatientChange(PatientResponse):
+    updated_at: datetime.datetime
+
+class SessionChange(BaseModel):
+    """
+    Changed session without its transcript; fetch that from /session/{id}/transcript.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    doctor_id: uuid.UUID
+    patient_id: uuid.UUID
+    template_id: Optional[uuid.UUID] = None
+    session_title: Optional[str] = None
+    session_summary: Optional[str] = None
+    transcript_status: Optional[str] = None
+    status: Optional[str] = None
+    date: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    duration: Optional[str] = None
+    updated_at: datetime.datetime
+
+class TemplateChange(TemplateResponse):
+    updated_at: datetime.datetime
+
+class DeletedItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    table_name: str
+    record_id: uuid.UUID
+    deleted_at: datetime.datetime
+
+class ChangesResponse(BaseModel):
+    patients: List[PatientChange]
+    sessions: List[SessionChange]
+    templates: List[TemplateChange]
+    deleted: List[DeletedItem]
+    cursor: str  # pass back as `since` on the next sync
+
+class MissingChunksResponse(BaseModel):
+    sessionId: uuid.UUID
+    totalChunks: Optional[int] = None  # unknown until a chunk reports totalChunksClient or isLast
+    receivedCount: int
+    highestChunk: int
+    missing: List[int]
+    complete: bool
+
+class DashboardPatient(BaseModel):
+    patientId: uuid.UUID
+    name: Optional[str] = None
+    sessionCount: int
+    lastSessionId: Optional[uuid.UUID] = None
+    lastSessionAt: Optional[datetime.datetime] = None
+
+class DashboardResponse(BaseModel):
+    sessionCount: int
+    statusCounts: Dict[str, int]  # recording / completed / failed
+    patientCount: int
+    lastSessionAt: Optional[datetime.datetime] = None
+    recentPatients: List[DashboardPatient]  # most recently seen first
@@ -0,0 +1,256 @@
+import os
+import re
+from abc import ABC, abstractmethod
+import tempfile
+from typing import AsyncIterator, Optional
+from fastapi.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+load_dotenv()
+
+# "supabase" (default) or "local"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+BUCKET_NAME = os.getenv("SUPABASE_BUCKET", "medinote-audio")
+
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "./storage")
+# Base URL clients use to reach this API when the local backend hands out upload/public URLs
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", "")
+
+# Bytes read from storage per block when streaming audio back to clients
+STORAGE_READ_BLOCK_SIZE = int(os.getenv("STORAGE_READ_BLOCK_SIZE", str(64 * 1024)))
+
+# Object paths are always sessions/<session id>/chunk_<n>.<ext> (see chunk_path)
+OBJECT_PATH_RE = re.compile(r"^sessions/[0-9A-Za-z-]+/[0-9A-Za-z_.-]+$")
+
+
+def mime_extension(mime_type: str) -> str:
+    # "audio/webm;codecs=opus" -> "webm": MediaRecorder types carry parameters
+    return mime_type.split(";", 1)[0].strip().split("/")[-1]
+
+
+def chunk_path(session_id, chunk_number, mime_type: str) -> str:
+    return f"sessions/{session_id}/chunk_{chunk_number}.{mime_extension(mime_type)}"
+
+
+def is_valid_path(path: str) -> bool:
+    return bool(OBJECT_PATH_RE.match(path)) and ".." not in path
+
+
+def path_session_id(path: str) -> str:
+    # sessions/<session id>/<object>; only meaningful for paths accepted by is_valid_path
+    return path.split("/")[1]
+
+
+class StorageBackend(ABC):
+    """
+    Interface for the object store that holds session audio.
+    """
+    @abstractmethod
+    async def create_signed_upload_url(self, path: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def public_url(self, path: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def write_stream(self, path: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        """
+        Stores the object at `path` from an async iterator of byte blocks and returns its size.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def size(self, path: str) -> int:
+        """
+        Returns the object's size in bytes. Raises FileNotFoundError if it does not exist.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_range(self, path: str, start: int, end: int, block_size: int = STORAGE_READ_BLOCK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Yields bytes start..end (inclusive) of the object in blocks of at most `block_size`.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def ping(self):
+        """
+        Raises if the backend is unreachable; used by the /ready probe.
+        """
+        raise NotImplementedError
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    Supabase Storage. The client is synchronous, so every call runs on the thread pool,
+    and it is only created on first use.
+    """
+    def __init__(self, url: str, key: str, bucket: str):
+        self.url = url
+        self.key = key
+        self.bucket = bucket
+        self._client = None
+        self._http = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from supabase import create_client
+            if not self.url or not self.key:
+                raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set for the supabase storage backend")
+            self._client = create_client(self.url, self.key)
+        return self._client
+
+    def _bucket(self):
+        return self.client.storage.from_(self.bucket)
+
+    async def create_signed_upload_url(self, path: str) -> str:
+        signed_url_data = await run_in_threadpool(self._bucket().create_signed_upload_url, path)
+        if not signed_url_data:
+            raise Exception("Could not generate signed URL")
+        return signed_url_data["signedUrl"]
+
+    def public_url(self, path: str) -> str:
+        # Deterministic from the project URL, bucket and path; no API call needed
+        return f"{(self.url or '').rstrip('/')}/storage/v1/object/public/{self.bucket}/{path}"
+
+    async def write_stream(self, path: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        # The supabase client uploads from a file, so spool to a temp file rather than memory
+        size = 0
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(path)[1]) as tmp:
+            async for block in chunks:
+                await run_in_threadpool(tmp.write, block)
+                size += len(block)
+            await run_in_threadpool(tmp.flush)
+            options = {"upsert": "true"}
+            if content_type:
+                options["content-type"] = content_type
+            await run_in_threadpool(self._bucket().upload, path, tmp.name, options)
+        return size
+
+    @property
+    def http(self):
+        # Reads go straight to the Storage REST API so the body can be streamed
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.key}", "apikey": self.key or ""},
+                timeout=httpx.Timeout(30.0, connect=5.0),
+            )
+        return self._http
+
+    def _object_url(self, path: str) -> str:
+        return f"{(self.url or '').rstrip('/')}/storage/v1/object/authenticated/{self.bucket}/{path}"
+
+    async def size(self, path: str) -> int:
+        response = await self.http.head(self._object_url(path))
+        if response.status_code in (400, 404):
+            raise FileNotFoundError(path)
+        response.raise_for_status()
+        return int(response.headers["content-length"])
+
+    async def read_range(self, path: str, start: int, end: int, block_size: int = STORAGE_READ_BLOCK_SIZE):
+        headers = {"Range": f"bytes={start}-{end}"}
+        async with self.http.stream("GET", self._object_url(path), headers=headers) as response:
+            if response.status_code in (400, 404):
+                raise FileNotFoundError(path)
+            response.raise_for_status()
+            if response.status_code == 200 and start:
+                raise RuntimeError(f"Storage ignored the range request for {path}")
+            remaining = end - start + 1
+            async for block in response.aiter_bytes(block_size):
+                yield block[:remaining]
+                remaining -= len(block)
+                if remaining <= 0:
+                    break
+
+    async def ping(self):
+        await run_in_threadpool(self.client.storage.get_bucket, self.bucket)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Local-disk storage for load tests and on-prem deployments. Uploads go to
+    PUT /v1/upload/{path} on this API and objects are served from GET /v1/storage/{path}.
+    """
+    def __init__(self, root: str, base_url: str = ""):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def local_path(self, path: str) -> str:
+        full = os.path.abspath(os.path.join(self.root, path))
+        if not full.startswith(self.root + os.sep):
+            raise ValueError("Invalid object path")
+        return full
+
+    async def create_signed_upload_url(self, path: str) -> str:
+        return f"{self.base_url}/v1/upload/{path}"
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/v1/storage/{path}"
+
+    async def write_stream(self, path: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        full = self.local_path(path)
+        await run_in_threadpool(os.makedirs, os.path.dirname(full), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial chunk. The name is
+        # unique, so a retried upload racing the first cannot share or delete its file.
+        fd, tmp_path = await run_in_threadpool(
+            tempfile.mkstemp, dir=os.path.dirname(full), prefix=os.path.basename(full) + ".", suffix=".part"
+        )
+        size = 0
+        f = os.fdopen(fd, "wb")
+        try:
+            async for block in chunks:
+                await run_in_threadpool(f.write, block)
+                size += len(block)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        f.close()
+        os.replace(tmp_path, full)
+        return size
+
+    async def size(self, path: str) -> int:
+        return (await run_in_threadpool(os.stat, self.local_path(path))).st_size
+
+    async def read_range(self, path: str, start: int, end: int, block_size: int = STORAGE_READ_BLOCK_SIZE):
+        f = await run_in_threadpool(open, self.local_path(path), "rb")
+        try:
+            await run_in_threadpool(f.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = await run_in_threadpool(f.read, min(block_size, remaining))
+                if not block:
+                    break
+                yield block
+                remaining -= len(block)
+        finally:
+            f.close()
+
+    async def ping(self):
+        await run_in_threadpool(os.makedirs, self.root, exist_ok=True)
+        if not os.access(self.root, os.W_OK):
+            raise RuntimeError(f"{self.root} is not writable")
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """
+    Returns the configured storage backend, creating it on first use.
+    """
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "local":
+            _storage = LocalStorage(LOCAL_STORAGE_DIR, LOCAL_STORAGE_BASE_URL)
+        elif STORAGE_BACKEND == "supabase":
+            _storage = SupabaseStorage(SUPABASE_URL, SUPABASE_SERVICE_KEY, BUCKET_NAME)
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _storage